@@ -39,9 +39,14 @@ _UNMANAGED_TABLES = {
 
 # Objects created via raw SQL (not modeled) that are FUNCTIONALLY CRITICAL and
 # must never be auto-dropped: the Spanish FTS generated column + the hybrid-search
-# GIN/trigram indexes.
+# GIN/trigram indexes (hybrid search + product name/SKU search).
 _PROTECTED_COLUMNS = {"chunk_tsv"}
-_PROTECTED_INDEXES = {"ix_document_chunk_tsv", "ix_file_metadata_filename_trgm"}
+_PROTECTED_INDEXES = {
+    "ix_document_chunk_tsv", "ix_file_metadata_filename_trgm",
+    "ix_product_sku_trgm", "ix_product_base_sku_trgm",
+    "ix_product_sku_lower", "ix_product_base_sku_lower",
+    "ix_product_name_unaccent_trgm", "ix_product_name_normalized_trgm",
+}
 
 
 def include_object(obj, name, type_, reflected, compare_to):
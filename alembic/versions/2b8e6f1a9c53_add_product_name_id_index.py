@@ -0,0 +1,33 @@
+"""add (name, id) index for the name-ordered GET /products keyset page
+
+- product (name, id) WHERE archived_at IS NULL: the default listing order
+  (`(name, id) > cursor ORDER BY name, id`) becomes an index range scan
+  instead of a sort over every matching row.
+
+Revision ID: 2b8e6f1a9c53
+Revises: 9d4f2b7e1c38
+Create Date: 2026-10-17
+
+Hand-written (autogenerate is NOT trusted on this DB). The index is modeled in
+models.py.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "2b8e6f1a9c53"
+down_revision: Union[str, Sequence[str], None] = "9d4f2b7e1c38"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_product_name_id", "product", ["name", "id"],
+        postgresql_where=sa.text("archived_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_name_id", table_name="product")
@@ -0,0 +1,30 @@
+"""add a trigram index for the GET /products base_sku search
+
+The sku filter matches `base_sku ILIKE '%…%' OR sku ILIKE '%…%'`; sku already
+has ix_product_sku_trgm, but without one on base_sku the OR still falls back to
+a seq scan. With both, Postgres can BitmapOr the two GIN scans.
+
+Revision ID: 3e9d5b1f6a27
+Revises: 7b2ce71dcbd2
+Create Date: 2026-10-17
+
+Hand-written (autogenerate is NOT trusted on this DB). The index is raw SQL and
+listed in env.py's _PROTECTED_INDEXES.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "3e9d5b1f6a27"
+down_revision: Union[str, Sequence[str], None] = "7b2ce71dcbd2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_product_base_sku_trgm ON product USING gin (base_sku gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_product_base_sku_trgm")
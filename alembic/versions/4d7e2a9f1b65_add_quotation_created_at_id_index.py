@@ -0,0 +1,33 @@
+"""add (created_at, id) index for the GET /quotation-history keyset page
+
+- quotation (created_at, id) WHERE archived_at IS NULL: the newest-first keyset
+  page (`(created_at, id) < cursor ORDER BY created_at DESC, id DESC`) becomes a
+  backward index range scan instead of a sort over every live quotation.
+
+Revision ID: 4d7e2a9f1b65
+Revises: 8a5d3f7c1b46
+Create Date: 2026-10-17
+
+Hand-written (autogenerate is NOT trusted on this DB). The index is modeled in
+models.py.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "4d7e2a9f1b65"
+down_revision: Union[str, Sequence[str], None] = "8a5d3f7c1b46"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_quotation_created_at_id", "quotation", ["created_at", "id"],
+        postgresql_where=sa.text("archived_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_quotation_created_at_id", table_name="quotation")
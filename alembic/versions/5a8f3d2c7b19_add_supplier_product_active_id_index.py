@@ -0,0 +1,38 @@
+"""add a partial id index for the live rows of supplier_product
+
+- supplier_product (id) WHERE archived_at IS NULL: the /products/supplier-product/
+  keyset page (`archived_at IS NULL AND id > cursor ORDER BY id`) and the NDJSON
+  export scan only live rows, in id order, without filtering archived ones out
+  of the primary key index.
+
+The other live-row orders already have partial indexes: quotation and product
+(created_at, id), product (name, id), and the supplier_product stock and
+total_value sorts.
+
+Revision ID: 5a8f3d2c7b19
+Revises: 7e3c1f8a2d90
+Create Date: 2026-10-17
+
+Hand-written (autogenerate is NOT trusted on this DB). The index is modeled in
+models.py.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "5a8f3d2c7b19"
+down_revision: Union[str, Sequence[str], None] = "7e3c1f8a2d90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_supplier_product_active_id", "supplier_product", ["id"],
+        postgresql_where=sa.text("archived_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_supplier_product_active_id", table_name="supplier_product")
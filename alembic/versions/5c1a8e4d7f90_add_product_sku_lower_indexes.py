@@ -0,0 +1,32 @@
+"""add lower(sku)/lower(base_sku) btree indexes for exact and prefix SKU lookups
+
+GET /products?sku=…&sku_match=exact|prefix filters on lower(sku) and
+lower(base_sku). text_pattern_ops btrees serve both the equality and the
+`LIKE 'abc%'` prefix form as index range scans, which is smaller and faster
+than the trigram GIN path kept for substring search.
+
+Revision ID: 5c1a8e4d7f90
+Revises: 3e9d5b1f6a27
+Create Date: 2026-10-17
+
+Hand-written (autogenerate is NOT trusted on this DB). Expression indexes are
+raw SQL and listed in env.py's _PROTECTED_INDEXES.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "5c1a8e4d7f90"
+down_revision: Union[str, Sequence[str], None] = "3e9d5b1f6a27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS ix_product_sku_lower ON product (lower(sku) text_pattern_ops)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_product_base_sku_lower ON product (lower(base_sku) text_pattern_ops)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_product_base_sku_lower")
+    op.execute("DROP INDEX IF EXISTS ix_product_sku_lower")
@@ -0,0 +1,46 @@
+"""add generated supplier_product.total_value and stock indexes for GET /products/stock
+
+- supplier_product.total_value = stock * cost, a STORED generated column, so the
+  `sort_by=total_value` stock listing orders by an indexed column instead of
+  computing and sorting the product for every row.
+- supplier_product (total_value) and (stock), both WHERE archived_at IS NULL:
+  the stock listing always filters on archived_at IS NULL and `stock >= n`.
+
+Revision ID: 6f3a9c2d8e14
+Revises: 2b8e6f1a9c53
+Create Date: 2026-10-17
+
+Hand-written (autogenerate is NOT trusted on this DB). The column and both
+indexes are modeled in models.py. Adding a stored generated column rewrites
+supplier_product once.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "6f3a9c2d8e14"
+down_revision: Union[str, Sequence[str], None] = "2b8e6f1a9c53"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "supplier_product",
+        sa.Column("total_value", sa.Numeric(), sa.Computed("stock * cost", persisted=True), nullable=True),
+    )
+    op.create_index(
+        "ix_supplier_product_total_value", "supplier_product", ["total_value"],
+        postgresql_where=sa.text("archived_at IS NULL"),
+    )
+    op.create_index(
+        "ix_supplier_product_stock", "supplier_product", ["stock"],
+        postgresql_where=sa.text("archived_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_supplier_product_stock", table_name="supplier_product")
+    op.drop_index("ix_supplier_product_total_value", table_name="supplier_product")
+    op.drop_column("supplier_product", "total_value")
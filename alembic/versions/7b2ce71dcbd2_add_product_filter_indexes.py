@@ -0,0 +1,44 @@
+"""add indexes for the GET /products filter predicates
+
+Partial btree indexes for the category/is_active and supplier filters (both only
+ever look at non-archived rows), plus a pg_trgm GIN index so the leading-wildcard
+ILIKE SKU search stops seq-scanning `product`. The name search matches on
+unaccent/regexp_replace expressions, indexed by 8a5d3f7c1b46, so a trigram index
+on raw `name` would never be used.
+
+Revision ID: 7b2ce71dcbd2
+Revises: a1f7c3e9b2d4
+Create Date: 2026-10-17
+
+Hand-written (autogenerate is NOT trusted on this DB). The trigram index is
+raw SQL and listed in env.py's _PROTECTED_INDEXES.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "7b2ce71dcbd2"
+down_revision: Union[str, Sequence[str], None] = "a1f7c3e9b2d4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_product_category_active", "product", ["category_id", "is_active"],
+        postgresql_where=sa.text("archived_at IS NULL"),
+    )
+    op.create_index(
+        "ix_supplier_product_supplier_product", "supplier_product", ["supplier_id", "product_id"],
+        postgresql_where=sa.text("archived_at IS NULL"),
+    )
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_product_sku_trgm ON product USING gin (sku gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_product_sku_trgm")
+    op.drop_index("ix_supplier_product_supplier_product", table_name="supplier_product")
+    op.drop_index("ix_product_category_active", table_name="product")
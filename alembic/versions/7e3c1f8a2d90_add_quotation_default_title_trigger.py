@@ -0,0 +1,49 @@
+"""derive a missing quotation.title from user_query in a BEFORE INSERT trigger
+
+- quotation_default_title(): when an INSERT leaves title NULL or empty, set it
+  to the first 50 characters of user_query, plus "..." if it was longer. This
+  is the rule create_quotation used to apply in Python, so every writer
+  (API or bulk load) gets the same titles.
+
+A GENERATED column can't be used: it can't be overridden by a supplied title.
+
+Revision ID: 7e3c1f8a2d90
+Revises: 4d7e2a9f1b65
+Create Date: 2026-10-17
+
+Hand-written (autogenerate is NOT trusted on this DB). models.py marks
+quotation.title with FetchedValue so the ORM reads the trigger's value back.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "7e3c1f8a2d90"
+down_revision: Union[str, Sequence[str], None] = "4d7e2a9f1b65"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION quotation_default_title() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.title IS NULL OR NEW.title = '' THEN
+                NEW.title := left(NEW.user_query, 50)
+                    || CASE WHEN char_length(NEW.user_query) > 50 THEN '...' ELSE '' END;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER quotation_default_title BEFORE INSERT ON quotation "
+        "FOR EACH ROW EXECUTE FUNCTION quotation_default_title()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS quotation_default_title ON quotation")
+    op.execute("DROP FUNCTION IF EXISTS quotation_default_title()")
@@ -0,0 +1,51 @@
+r"""add trigram indexes for the GET /products unaccented fuzzy name search
+
+The name filter matches `unaccent(name) ILIKE ...` plus trigram (word)
+similarity on the space-stripped, unaccented name. unaccent() is only STABLE
+(its dictionary can change), so Postgres refuses it in an index expression.
+immutable_unaccent pins the dictionary and is declared IMMUTABLE; the route
+uses it verbatim so the planner can match:
+
+- ix_product_name_unaccent_trgm: immutable_unaccent(name) gin_trgm_ops, for the ILIKE
+- ix_product_name_normalized_trgm: regexp_replace(immutable_unaccent(name), '\s+', '', 'g')
+  gin_trgm_ops, for the `%` / `<%` similarity operators
+
+Revision ID: 8a5d3f7c1b46
+Revises: 6f3a9c2d8e14
+Create Date: 2026-10-17
+
+Hand-written (autogenerate is NOT trusted on this DB). The indexes are raw SQL
+and listed in env.py's _PROTECTED_INDEXES.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "8a5d3f7c1b46"
+down_revision: Union[str, Sequence[str], None] = "6f3a9c2d8e14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute(
+        "CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+        "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_product_name_unaccent_trgm ON product "
+        "USING gin (immutable_unaccent(name) gin_trgm_ops)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_product_name_normalized_trgm ON product "
+        "USING gin (regexp_replace(immutable_unaccent(name), '\\s+', '', 'g') gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_product_name_normalized_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_product_name_unaccent_trgm")
+    op.execute("DROP FUNCTION IF EXISTS immutable_unaccent(text)")
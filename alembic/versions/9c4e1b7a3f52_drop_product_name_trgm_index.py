@@ -0,0 +1,31 @@
+"""drop the unused trigram index on raw product.name
+
+ix_product_name_trgm (name gin_trgm_ops) was created by 7b2ce71dcbd2, but the
+name filter matches on immutable_unaccent(...) / regexp_replace(...) expressions,
+which 8a5d3f7c1b46 indexes; the planner never uses the raw-column index and it
+only slows down writes. 7b2ce71dcbd2 no longer creates it; this drops it on
+databases that already ran that revision.
+
+Revision ID: 9c4e1b7a3f52
+Revises: 5a8f3d2c7b19
+Create Date: 2026-10-17
+
+Hand-written (autogenerate is NOT trusted on this DB).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "9c4e1b7a3f52"
+down_revision: Union[str, Sequence[str], None] = "5a8f3d2c7b19"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_product_name_trgm")
+
+
+def downgrade() -> None:
+    # Not recreated: 7b2ce71dcbd2 no longer creates it either
+    pass
@@ -0,0 +1,38 @@
+"""add composite indexes for the GET /products keyset order and supplier cost lookups
+
+- product (created_at, id) WHERE archived_at IS NULL: the newest-first keyset
+  page (`(created_at, id) < cursor ORDER BY created_at DESC, id DESC`) becomes a
+  backward index range scan instead of a sort over every matching row.
+- supplier_product (product_id, is_active): the per-product lowest-cost lookup
+  used for listing prices and /{product_id}/supplier-products filter on
+  product_id, which the (supplier_id, product_id) index can't serve.
+
+Revision ID: 9d4f2b7e1c38
+Revises: 5c1a8e4d7f90
+Create Date: 2026-10-17
+
+Hand-written (autogenerate is NOT trusted on this DB). Both indexes are modeled
+in models.py.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "9d4f2b7e1c38"
+down_revision: Union[str, Sequence[str], None] = "5c1a8e4d7f90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_product_created_at_id", "product", ["created_at", "id"],
+        postgresql_where=sa.text("archived_at IS NULL"),
+    )
+    op.create_index("ix_supplier_product_product_active", "supplier_product", ["product_id", "is_active"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_supplier_product_product_active", table_name="supplier_product")
+    op.drop_index("ix_product_created_at_id", table_name="product")
@@ -0,0 +1,40 @@
+"""add message_batch_job
+
+Pending async_batch /quotations/process-batch jobs: each file's path and
+extracted text, keyed by the Anthropic message batch id, until a status poll
+saves the results. claimed_at marks the poll that is saving them.
+
+Revision ID: b3f8d1e6a925
+Revises: 9c4e1b7a3f52
+Create Date: 2026-10-17
+
+Hand-written (autogenerate is NOT trusted on this DB). The table is modeled in
+models.py.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "b3f8d1e6a925"
+down_revision: Union[str, Sequence[str], None] = "9c4e1b7a3f52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "message_batch_job",
+        sa.Column("batch_id", sa.String(length=100), nullable=False),
+        sa.Column("category_id", sa.Integer(), nullable=True),
+        sa.Column("total_files", sa.Integer(), nullable=False),
+        sa.Column("files", sa.JSON(), nullable=False),
+        sa.Column("errors", sa.JSON(), nullable=False),
+        sa.Column("claimed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("batch_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("message_batch_job")
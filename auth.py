@@ -2,7 +2,10 @@ from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from google.oauth2 import id_token
 from google.auth.transport import requests
+from hashlib import blake2b
 import os
+import time
+from utils.ttl_cache import TTLCache
 
 # Your Google OAuth Client ID
 GOOGLE_CLIENT_ID = "223254458497-5tllach8urthlqtcau15sr35kaeicaqc.apps.googleusercontent.com"
@@ -32,6 +35,35 @@ DEV_USER = {
     "user_id": "dev-local",
 }
 
+# Google's transport request wraps a requests.Session; reuse one so cert fetches
+# keep their pooled HTTPS connection instead of reconnecting per verification.
+_google_request = requests.Request()
+
+# Verified tokens -> user. Entries live until the token's own exp, capped at
+# TOKEN_CACHE_TTL seconds, so repeat requests skip signature checks. The cache is
+# bounded: past TOKEN_CACHE_SIZE tokens the least recently used one is dropped.
+TOKEN_CACHE_TTL = 300
+TOKEN_CACHE_SIZE = 1024
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+
+def _token_key(credentials: str) -> bytes:
+    return blake2b(credentials.encode("utf-8"), digest_size=16).digest()
+
+
+def _get_cached_user(key: bytes):
+    return _token_cache.get(key)
+
+
+def _cache_user(key: bytes, user: dict, token_exp) -> None:
+    ttl = TOKEN_CACHE_TTL
+    if token_exp is not None:
+        ttl = min(ttl, float(token_exp) - time.time())
+    if ttl <= 0:
+        return
+    _token_cache.set(key, user, ttl=ttl)
+
+
 def verify_google_token(token: HTTPAuthorizationCredentials | None = Depends(security)):
     """
     Verify Google OAuth token and check if user is authorized.
@@ -43,11 +75,16 @@ def verify_google_token(token: HTTPAuthorizationCredentials | None = Depends(sec
     if token is None:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
+    cache_key = _token_key(token.credentials)
+    cached_user = _get_cached_user(cache_key)
+    if cached_user is not None:
+        return cached_user
+
     try:
         # Verify the token with Google's servers
         idinfo = id_token.verify_oauth2_token(
             token.credentials,
-            requests.Request(),
+            _google_request,
             GOOGLE_CLIENT_ID
         )
 
@@ -64,12 +101,14 @@ def verify_google_token(token: HTTPAuthorizationCredentials | None = Depends(sec
             )
 
         # Return user info for use in endpoints
-        return {
+        user = {
             "email": email,
             "name": idinfo.get('name'),
             "picture": idinfo.get('picture'),
             "user_id": idinfo.get('sub')
         }
+        _cache_user(cache_key, user, idinfo.get('exp'))
+        return user
 
     except ValueError as e:
         # Token verification failed
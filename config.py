@@ -7,6 +7,9 @@ pinecone_api_key = os.getenv("PINECONE_API_KEY")
 pinecone_environment = os.getenv("PINECONE_ENV")
 claude_api_key = os.getenv("CLAUDE_API_KEY")
 database_url = os.getenv("DATABASE_URL")
+# SQLAlchemy pool per worker process: gunicorn -w 4 opens up to 4 * (size + overflow) connections
+db_pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
 
 # Cloudflare R2 Storage
 r2_account_id = os.getenv("R2_ACCOUNT_ID")
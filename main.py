@@ -10,7 +10,7 @@ from datetime import datetime
 from routes import suppliers, products, quotations
 from routes.products import router as products_router
 from routes.suppliers import router as suppliers_router
-from routes.quotations import router as quotations_router
+from routes.quotations import router as quotations_router, shutdown_parse_executor
 from routes.categories import router as categories_router
 from routes.kits import router as kits_router
 from routes.balance import router as balance_router
@@ -30,6 +30,7 @@ from routes.roadmap import router as roadmap_router
 from routes.customers import router as customers_router
 from routes.jobs import router as jobs_router
 from auth import verify_google_token
+from utils.etag import ETagMiddleware
 
 # Lazy import for RAG system to ensure route registration even if import fails
 def get_rag_query_function():
@@ -53,6 +54,9 @@ static_dir = os.path.join(os.path.dirname(__file__), "static")
 if os.path.exists(static_dir):
     app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
+# ETag/304 for product reads; registered before CORS so 304s still get CORS headers
+app.add_middleware(ETagMiddleware, path_prefixes=("/products",))
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -66,8 +70,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+@app.on_event("shutdown")
+def shutdown_quotation_pools():
+    shutdown_parse_executor()
+
 # Include routers
 app.include_router(products_router)
 app.include_router(suppliers_router)
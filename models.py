@@ -1,10 +1,10 @@
-from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Float, ForeignKey, create_engine, Boolean, Text, Numeric, JSON, Enum, Date, Index
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Float, ForeignKey, create_engine, Boolean, Text, Numeric, JSON, Enum, Date, Index, Computed, FetchedValue
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
-from config import database_url
+from config import database_url, db_pool_size, db_max_overflow
 from urllib.parse import urlparse, parse_qs, urlencode
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from pgvector.sqlalchemy import Vector
 import enum
 import os
@@ -78,6 +78,12 @@ class Product(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     last_updated = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        Index("ix_product_category_active", "category_id", "is_active", postgresql_where=text("archived_at IS NULL")),
+        Index("ix_product_created_at_id", "created_at", "id", postgresql_where=text("archived_at IS NULL")),
+        Index("ix_product_name_id", "name", "id", postgresql_where=text("archived_at IS NULL")),
+    )
+
     category = relationship("ProductCategory", back_populates="products")
     supplier_products = relationship("SupplierProduct", back_populates="product")
 
@@ -106,6 +112,7 @@ class SupplierProduct(Base):
     default_margin = Column(Numeric(5, 4), nullable=True)  # Margin as decimal (0.25 = 25%). Formula: price = cost / (1 - margin)
     currency = Column(String(3), default='MXN', nullable=False)  # Currency of cost and shipping costs (MXN or USD)
     stock = Column(Integer, default=0)
+    total_value = Column(Numeric, Computed("stock * cost", persisted=True))  # Generated: stock value, for sorting GET /products/stock
     lead_time_days = Column(Integer, nullable=True)
     shipping_cost = Column(Numeric(10, 2), nullable=True)  # Legacy shipping cost (deprecated)
     shipping_cost_direct = Column(Numeric(10, 2), default=0.00, nullable=False)  # Direct shipping cost per unit
@@ -123,6 +130,14 @@ class SupplierProduct(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     last_updated = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        Index("ix_supplier_product_supplier_product", "supplier_id", "product_id", postgresql_where=text("archived_at IS NULL")),
+        Index("ix_supplier_product_product_active", "product_id", "is_active"),
+        Index("ix_supplier_product_total_value", "total_value", postgresql_where=text("archived_at IS NULL")),
+        Index("ix_supplier_product_stock", "stock", postgresql_where=text("archived_at IS NULL")),
+        Index("ix_supplier_product_active_id", "id", postgresql_where=text("archived_at IS NULL")),
+    )
+
     supplier = relationship("Supplier", back_populates="products")
     product = relationship("Product", back_populates="supplier_products")
     category = relationship("ProductCategory", foreign_keys=[category_id])
@@ -337,7 +352,7 @@ class Quotation(Base):
     user_id = Column(String, nullable=False, index=True)  # Google user ID (sub)
     user_email = Column(String, nullable=False, index=True)  # User email for easier querying
     user_query = Column(Text, nullable=False)  # Original query that generated the quotation
-    title = Column(String(500), nullable=True)  # Optional title (can be auto-generated)
+    title = Column(String(500), nullable=True, server_default=FetchedValue())  # Optional title; the quotation_default_title trigger fills a missing one from user_query
     customer_name = Column(String(200), nullable=True)  # Customer name
     customer_location = Column(String(200), nullable=True)  # Customer location
     quotation_id = Column(String(50), nullable=True)  # Generated quotation ID
@@ -347,6 +362,10 @@ class Quotation(Base):
     archived_at = Column(DateTime(timezone=True), nullable=True)  # Soft delete timestamp
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_quotation_created_at_id", "created_at", "id", postgresql_where=text("archived_at IS NULL")),
+    )
     
 class SocialPost(Base):
     __tablename__ = "social_post"
@@ -637,6 +656,19 @@ class Notification(Base):
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
 
+class MessageBatchJob(Base):
+    """An async_batch /quotations/process-batch job whose Message Batches results are not saved yet."""
+    __tablename__ = "message_batch_job"
+
+    batch_id = Column(String(100), primary_key=True)  # Anthropic message batch id
+    category_id = Column(Integer, nullable=True)
+    total_files = Column(Integer, nullable=False)
+    files = Column(JSON, nullable=False)  # custom_id -> {file_path, text}; files still to be saved
+    errors = Column(JSON, nullable=False)  # Text extraction errors, reported with the results
+    claimed_at = Column(DateTime(timezone=True), nullable=True)  # Set while a poll is saving the results
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
 def get_next_quote_number(db):
     """Generate the next quote number in format TEC-{YEAR}-{XXXX}."""
     import datetime
@@ -665,12 +697,19 @@ modified_url = parsed_url._replace(query=new_query).geturl()
 if not modified_url.startswith('postgresql+psycopg2://'):
     modified_url = modified_url.replace('postgresql://', 'postgresql+psycopg2://')
 
-# Database setup with explicit driver configuration
+# Database setup with explicit driver configuration.
+# The pool is per worker process, so its size comes from DB_POOL_SIZE / DB_MAX_OVERFLOW
+# (config.py). The defaults are the original 5 + 10 per worker; lower them when
+# workers * (size + overflow) would exceed the database's connection limit.
+# Connections are recycled hourly so none outlive Neon's idle/proxy timeouts.
 engine = create_engine(
     modified_url,
     pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
+    pool_size=db_pool_size,
+    max_overflow=db_max_overflow,
+    pool_recycle=3600,
+    # Compiled-SQL LRU; the default 500 is easily churned by get_products' filter/sort combinations
+    query_cache_size=1200,
     connect_args={
         "application_name": "impag-quot"
     }
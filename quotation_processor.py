@@ -1,9 +1,9 @@
 import re
 import json
 import os
-import fitz  # PyMuPDF
 import anthropic
 import copy
+import threading
 from sqlalchemy.orm import Session
 from typing import Dict, List, Optional
 from models import (
@@ -12,6 +12,12 @@ from models import (
 )
 from utils.currency_utils import CurrencyUtils
 from utils.json_repair import JSONRepair
+from utils.pdf_text import extract_pdf_text
+
+# Held for the whole save transaction: get_or_create_supplier is a SELECT followed by an
+# INSERT and Supplier names are not unique, so concurrent saves (batch threads, parallel
+# /process requests) naming the same new supplier would each create it.
+_save_lock = threading.Lock()
 
 class HybridSKUGenerator:
     def __init__(self):
@@ -143,13 +149,7 @@ class QuotationProcessor:
         
     def extract_text_from_pdf(self, pdf_path: str) -> str:
         """Extract text from PDF file."""
-        try:
-            doc = fitz.open(pdf_path)
-            text = "\n".join([page.get_text() for page in doc])
-            doc.close()
-            return text
-        except Exception as e:
-            raise Exception(f"Error extracting text from PDF: {str(e)}")
+        return extract_pdf_text(pdf_path)
     
     def extract_text_from_image(self, image_path: str) -> str:
         """Extract text from image file using Claude Vision API."""
@@ -384,10 +384,10 @@ Return only the extracted text, without any additional commentary or analysis.""
         
         return processed_text if processed_text else text[:max_length]
 
-    def extract_structured_data(self, pdf_text: str, categories: List[Dict]) -> Dict:
+    def build_extraction_params(self, pdf_text: str, categories: List[Dict]) -> Dict:
         """
-        Use Claude to extract structured supplier and product data from PDF text.
-        Enhanced to include SKU suggestions and automatic category selection.
+        Build the messages.create arguments that extract structured data from `pdf_text`.
+        Used as-is for the synchronous call and as the params of a Message Batches request.
         """
         print("🔍 Preprocessing text...")
         # Preprocess very long text to focus on product information
@@ -422,11 +422,11 @@ Return only the extracted text, without any additional commentary or analysis.""
             for cat in categories
         ])
         
-        prompt = """You are an assistant that extracts structured information from supplier quotations and product information for a procurement system.
+        # The instructions and category list are the same for every document, so they go in a
+        # cached system prompt; only the document text changes between calls in a batch.
+        instructions = """You are an assistant that extracts structured information from supplier quotations and product information for a procurement system.
 
-<document_text>
-{processed_text}
-</document_text>
+The document to process is in the <document_text> tags of the user message.
 
 <available_categories>
 {categories_text}
@@ -592,206 +592,213 @@ EXAMPLE VALID JSON FORMAT:
 }
 
 Respond only with the JSON object, no extra explanation.""".replace(
-            "{processed_text}", processed_text
-        ).replace(
             "{categories_text}", categories_text
         )
+        system = [{"type": "text", "text": instructions, "cache_control": {"type": "ephemeral"}}]
+        messages = [{"role": "user", "content": f"<document_text>\n{processed_text}\n</document_text>"}]
+        return {"model": self.model, "max_tokens": 20000, "temperature": 0, "system": system, "messages": messages}
 
+    def extract_structured_data(self, pdf_text: str, categories: List[Dict]) -> Dict:
+        """
+        Use Claude to extract structured supplier and product data from PDF text.
+        Enhanced to include SKU suggestions and automatic category selection.
+        """
+        params = self.build_extraction_params(pdf_text, categories)
         try:
             print("🤖 Calling Claude AI...")
             # Try with full token limit first
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=20000,
-                temperature=0,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            response = self.client.messages.create(**params)
             
-            print("🤖 AI response received, processing...")
-            content = response.content[0].text.strip()
-            # Remove potential markdown formatting
-            if content.startswith("```json"):
-                content = content[7:-3]
-            elif content.startswith("```"):
-                content = content[3:-3]
+            usage = response.usage
+            print(f"🤖 AI response received, processing... (cache read {usage.cache_read_input_tokens or 0}, "
+                  f"cache write {usage.cache_creation_input_tokens or 0}, uncached {usage.input_tokens} input tokens)")
+            return self.parse_extraction_response(response.content[0].text.strip(), pdf_text, params)
             
-            # Try to parse the JSON, with error handling for malformed responses
-            print("🔍 Attempting JSON parsing...")
-            try:
-                data = json.loads(content)
-                print("✅ JSON parsed successfully")
-            except json.JSONDecodeError as e:
-                print(f"❌ JSON parsing error: {str(e)}")
-                print(f"Content length: {len(content)} characters")
-                print(f"Content preview: {content[:500]}...")
-                print(f"Content starts with: {repr(content[:50])}")
-                print(f"Content ends with: {repr(content[-50:])}")
-                
-                # Try JSON repair utility first
-                print("🔧 Attempting JSON repair...")
-                data = JSONRepair.repair_json(content)
+        except json.JSONDecodeError as e:
+            print(f"❌ JSON decode error in extract_structured_data: {str(e)}")
+            raise Exception(f"Failed to parse Claude response as JSON: {str(e)}")
+        except Exception as e:
+            print(f"❌ General error in extract_structured_data: {str(e)}")
+            raise Exception(f"Claude API error: {str(e)}")
+
+    def parse_extraction_response(self, content: str, pdf_text: str, params: Dict) -> Dict:
+        """
+        Parse Claude's JSON answer to the `params` extraction request and post-process it.
+        Malformed JSON is repaired, or re-requested synchronously with a smaller token limit.
+        """
+        # Remove potential markdown formatting
+        if content.startswith("```json"):
+            content = content[7:-3]
+        elif content.startswith("```"):
+            content = content[3:-3]
+        
+        # Try to parse the JSON, with error handling for malformed responses
+        print("🔍 Attempting JSON parsing...")
+        try:
+            data = json.loads(content)
+            print("✅ JSON parsed successfully")
+        except json.JSONDecodeError as e:
+            print(f"❌ JSON parsing error: {str(e)}")
+            print(f"Content length: {len(content)} characters")
+            print(f"Content preview: {content[:500]}...")
+            print(f"Content starts with: {repr(content[:50])}")
+            print(f"Content ends with: {repr(content[-50:])}")
+            
+            # Try JSON repair utility first
+            print("🔧 Attempting JSON repair...")
+            data = JSONRepair.repair_json(content)
+            if data:
+                print("✅ Successfully repaired JSON")
+            else:
+                print("❌ JSON repair failed, trying extraction...")
+                # Try extracting products array
+                print("🔧 Attempting to extract products array...")
+                data = JSONRepair.extract_products_array(content)
                 if data:
-                    print("✅ Successfully repaired JSON")
+                    print("✅ Successfully extracted products array")
                 else:
-                    print("❌ JSON repair failed, trying extraction...")
-                    # Try extracting products array
-                    print("🔧 Attempting to extract products array...")
-                    data = JSONRepair.extract_products_array(content)
-                    if data:
-                        print("✅ Successfully extracted products array")
-                    else:
-                        print("❌ All repair attempts failed, retrying with reduced tokens...")
-                        # If all else fails, try with reduced token limit
-                        print("🔄 Retrying with reduced token limit...")
-                        try:
-                            retry_response = self.client.messages.create(
-                                model=self.model,
-                                max_tokens=5000,  # Reduced token limit
-                                temperature=0,
-                                messages=[{"role": "user", "content": prompt}]
-                            )
-                            
-                            retry_content = retry_response.content[0].text.strip()
-                            if retry_content.startswith("```json"):
-                                retry_content = retry_content[7:-3]
-                            elif retry_content.startswith("```"):
-                                retry_content = retry_content[3:-3]
-                            
-                            data = json.loads(retry_content)
-                            print("✅ Successfully parsed JSON with reduced token limit")
-                            
-                        except Exception as retry_error:
-                            print(f"❌ All repair attempts failed: {str(retry_error)}")
-                            print(f"🔍 Final category verification: Extracted data from Claude: {data}")
-                            data = {
-                                "products": [],
-                                "error": f"Failed to parse AI response as JSON: {str(e)}"
-                            }
-            
-            # Post-process supplier information for each product to ensure IMPAG is not extracted as supplier
-            if 'products' in data:
-                for product in data['products']:
-                    if 'supplier' in product:
-                        supplier_info = product['supplier']
-                        supplier_name = (supplier_info.get('name') or '').upper()
+                    print("❌ All repair attempts failed, retrying with reduced tokens...")
+                    # If all else fails, try with reduced token limit
+                    print("🔄 Retrying with reduced token limit...")
+                    try:
+                        retry_response = self.client.messages.create(
+                            **{**params, "max_tokens": 5000}  # Reduced token limit
+                        )
                         
-                        # Check if the extracted supplier name contains IMPAG
-                        if 'IMPAG' in supplier_name:
-                            print(f"\n⚠️  IMPAG detected in supplier name for product '{product.get('name')}': {supplier_info.get('name')}")
-                            print("   IMPAG is the receiving company, not the supplier")
-                            
-                            # Try to find alternative supplier name in the text
-                            alternative_supplier = self._find_alternative_supplier(pdf_text)
-                            if alternative_supplier:
-                                print(f"   → Using alternative: {alternative_supplier}")
-                                supplier_info['name'] = alternative_supplier
-                                supplier_info['legal_name'] = alternative_supplier
-                            else:
-                                print("   → Manual review required - no alternative found")
-                                # Set a default supplier name if no alternative found
-                                supplier_info['name'] = "Unknown Supplier"
-                                supplier_info['legal_name'] = "Unknown Supplier"
-            
-            # Post-process category assignments using keyword analysis
-            if 'products' in data:
-                for product in data['products']:
-                    product_name = product.get('name', '')
-                    description = product.get('description', '')
-                    current_category = product.get('category_id')
-                    
-                    print(f"\n🔍 Analyzing category for: '{product_name}'")
-                    print(f"   Current category: {current_category}")
-                    
-                    # Get keyword-based suggestion
-                    suggested_category = self.get_suggested_category(product_name, description)
-                    print(f"   Keyword suggestion: {suggested_category}")
-                    
-                    # Enhanced category override logic
-                    text = f"{product_name} {description}".upper()
-                    print(f"   Analyzing text: {text}")
-                    
-                    # Strong override for solar products (Category 6)
-                    solar_keywords = ["SOLAR", "FOTOVOLT", "PANEL", "INVERSOR", "BATERIA", "CONTROLADOR SOLAR", "ONDULA", "SENOIDAL", "MODIFICADA", "CICLO PROFUNDO", "AGM", "VCD", "AH", "VCC", "POLI", "CEL", "CONECTOR", "MC4"]
-                    solar_matches = [keyword for keyword in solar_keywords if keyword in text]
-                    if solar_matches:
-                        print(f"   Solar keywords found: {solar_matches}")
-                        if current_category != 6:
-                            print(f"\n🔧 FORCING Category 6 for solar product: '{product_name}'")
-                            print(f"  AI chose: Category {current_category}")
-                            print(f"  OVERRIDING to Category 6 (Solar Energy Systems)")
-                            product['category_id'] = 6
-                        else:
-                            print(f"   Already Category 6, no override needed")
-                        continue
-                    
-                    # Strong override for shipping/transport (Category 13)
-                    shipping_keywords = ["VIAS", "EMBARQUE", "VOLUMEN", "TERRESTRE"]
-                    shipping_matches = [keyword for keyword in shipping_keywords if keyword in text]
-                    if shipping_matches:
-                        print(f"   Shipping keywords found: {shipping_matches}")
-                        if current_category != 13:
-                            print(f"\n🔧 FORCING Category 13 for shipping product: '{product_name}'")
-                            print(f"  AI chose: Category {current_category}")
-                            print(f"  OVERRIDING to Category 13 (Bags and Containers)")
-                            product['category_id'] = 13
-                        else:
-                            print(f"   Already Category 13, no override needed")
-                        continue
-                    
-                    # If AI chose category 3 but keyword analysis suggests something else, consider overriding
-                    if current_category == 3 and suggested_category and suggested_category != 3:
-                        print(f"\nCategory override suggestion for '{product_name}':")
-                        print(f"  AI chose: Category 3 (Insumos para Propagacion)")
-                        print(f"  Keywords suggest: Category {suggested_category}")
+                        retry_content = retry_response.content[0].text.strip()
+                        if retry_content.startswith("```json"):
+                            retry_content = retry_content[7:-3]
+                        elif retry_content.startswith("```"):
+                            retry_content = retry_content[3:-3]
+                        
+                        data = json.loads(retry_content)
+                        print("✅ Successfully parsed JSON with reduced token limit")
                         
-                        # Only override if keyword confidence is high (multiple keyword matches)
-                        category_keywords = {
-                            1: ["SOMBRA", "INVERNADERO", "PLASTICO", "FILM", "COBERTURA", "VENTILACION", "CALEFACCION", "RAFIA", "ESTRUCTURA"],
-                            2: ["RIEGO", "ASPERSOR", "GOTERO", "VALVULA", "CONTROLADOR", "FILTRO", "TUBERIA", "MANGUERA", "CONEXION"],
-                            4: ["TRAMPA", "PESTICIDA", "FUNGICIDA", "HERBICIDA", "PROTECCION"],
-                            14: ["CINTA", "MANGUERA", "TUBERIA", "PVC", "FLEXIBLE", "CONEXION", "POLIPATCH"],
+                    except Exception as retry_error:
+                        print(f"❌ All repair attempts failed: {str(retry_error)}")
+                        print(f"🔍 Final category verification: Extracted data from Claude: {data}")
+                        data = {
+                            "products": [],
+                            "error": f"Failed to parse AI response as JSON: {str(e)}"
                         }
+        
+        # Post-process supplier information for each product to ensure IMPAG is not extracted as supplier
+        if 'products' in data:
+            for product in data['products']:
+                if 'supplier' in product:
+                    supplier_info = product['supplier']
+                    supplier_name = (supplier_info.get('name') or '').upper()
+                    
+                    # Check if the extracted supplier name contains IMPAG
+                    if 'IMPAG' in supplier_name:
+                        print(f"\n⚠️  IMPAG detected in supplier name for product '{product.get('name')}': {supplier_info.get('name')}")
+                        print("   IMPAG is the receiving company, not the supplier")
                         
-                        if suggested_category in category_keywords:
-                            keyword_matches = sum(1 for keyword in category_keywords[suggested_category] if keyword in text)
-                            if keyword_matches >= 2:  # High confidence threshold
-                                print(f"  OVERRIDING to Category {suggested_category} (confidence: {keyword_matches} keywords)")
-                                product['category_id'] = suggested_category
-                            else:
-                                print(f"  Keeping Category 3 (low keyword confidence: {keyword_matches})")
+                        # Try to find alternative supplier name in the text
+                        alternative_supplier = self._find_alternative_supplier(pdf_text)
+                        if alternative_supplier:
+                            print(f"   → Using alternative: {alternative_supplier}")
+                            supplier_info['name'] = alternative_supplier
+                            supplier_info['legal_name'] = alternative_supplier
                         else:
-                            print(f"  Keeping Category 3 (no specific keyword guidance)")
-            
-            # Final aggressive override for solar products that might have been missed
-            print(f"\n🔍 Final category verification:")
+                            print("   → Manual review required - no alternative found")
+                            # Set a default supplier name if no alternative found
+                            supplier_info['name'] = "Unknown Supplier"
+                            supplier_info['legal_name'] = "Unknown Supplier"
+        
+        # Post-process category assignments using keyword analysis
+        if 'products' in data:
             for product in data['products']:
                 product_name = product.get('name', '')
-                final_category = product.get('category_id')
-                text = f"{product_name}".upper()
+                description = product.get('description', '')
+                current_category = product.get('category_id')
                 
-                # Check for obvious solar terms and force category 6
-                obvious_solar_terms = ["INV.", "SAMLEX", "ONDULA", "SENOIDAL", "MODIFICADA", "BAT CICLO", "PROFUNDO", "AGM", "VCD", "AH", "CONTROLADOR SOLAR", "MOD SOL", "FOTOVOLT", "VCC", "POLI", "CEL", "CONECTOR", "MC4"]
-                if any(term in text for term in obvious_solar_terms) and final_category != 6:
-                    print(f"  🚨 FINAL OVERRIDE: '{product_name}' → Category 6 (was {final_category})")
-                    product['category_id'] = 6
-                elif final_category == 6:
-                    print(f"  ✅ '{product_name}' → Category 6 (correct)")
-                else:
-                    print(f"  📋 '{product_name}' → Category {final_category}")
-            
-            # Debug: Print the extracted data
-            print("\nExtracted data from Claude:")
-            print(json.dumps(data, indent=2))
-            print("✅ Returning structured data successfully")
-            
-            return data
+                print(f"\n🔍 Analyzing category for: '{product_name}'")
+                print(f"   Current category: {current_category}")
+                
+                # Get keyword-based suggestion
+                suggested_category = self.get_suggested_category(product_name, description)
+                print(f"   Keyword suggestion: {suggested_category}")
+                
+                # Enhanced category override logic
+                text = f"{product_name} {description}".upper()
+                print(f"   Analyzing text: {text}")
+                
+                # Strong override for solar products (Category 6)
+                solar_keywords = ["SOLAR", "FOTOVOLT", "PANEL", "INVERSOR", "BATERIA", "CONTROLADOR SOLAR", "ONDULA", "SENOIDAL", "MODIFICADA", "CICLO PROFUNDO", "AGM", "VCD", "AH", "VCC", "POLI", "CEL", "CONECTOR", "MC4"]
+                solar_matches = [keyword for keyword in solar_keywords if keyword in text]
+                if solar_matches:
+                    print(f"   Solar keywords found: {solar_matches}")
+                    if current_category != 6:
+                        print(f"\n🔧 FORCING Category 6 for solar product: '{product_name}'")
+                        print(f"  AI chose: Category {current_category}")
+                        print(f"  OVERRIDING to Category 6 (Solar Energy Systems)")
+                        product['category_id'] = 6
+                    else:
+                        print(f"   Already Category 6, no override needed")
+                    continue
+                
+                # Strong override for shipping/transport (Category 13)
+                shipping_keywords = ["VIAS", "EMBARQUE", "VOLUMEN", "TERRESTRE"]
+                shipping_matches = [keyword for keyword in shipping_keywords if keyword in text]
+                if shipping_matches:
+                    print(f"   Shipping keywords found: {shipping_matches}")
+                    if current_category != 13:
+                        print(f"\n🔧 FORCING Category 13 for shipping product: '{product_name}'")
+                        print(f"  AI chose: Category {current_category}")
+                        print(f"  OVERRIDING to Category 13 (Bags and Containers)")
+                        product['category_id'] = 13
+                    else:
+                        print(f"   Already Category 13, no override needed")
+                    continue
+                
+                # If AI chose category 3 but keyword analysis suggests something else, consider overriding
+                if current_category == 3 and suggested_category and suggested_category != 3:
+                    print(f"\nCategory override suggestion for '{product_name}':")
+                    print(f"  AI chose: Category 3 (Insumos para Propagacion)")
+                    print(f"  Keywords suggest: Category {suggested_category}")
+                    
+                    # Only override if keyword confidence is high (multiple keyword matches)
+                    category_keywords = {
+                        1: ["SOMBRA", "INVERNADERO", "PLASTICO", "FILM", "COBERTURA", "VENTILACION", "CALEFACCION", "RAFIA", "ESTRUCTURA"],
+                        2: ["RIEGO", "ASPERSOR", "GOTERO", "VALVULA", "CONTROLADOR", "FILTRO", "TUBERIA", "MANGUERA", "CONEXION"],
+                        4: ["TRAMPA", "PESTICIDA", "FUNGICIDA", "HERBICIDA", "PROTECCION"],
+                        14: ["CINTA", "MANGUERA", "TUBERIA", "PVC", "FLEXIBLE", "CONEXION", "POLIPATCH"],
+                    }
+                    
+                    if suggested_category in category_keywords:
+                        keyword_matches = sum(1 for keyword in category_keywords[suggested_category] if keyword in text)
+                        if keyword_matches >= 2:  # High confidence threshold
+                            print(f"  OVERRIDING to Category {suggested_category} (confidence: {keyword_matches} keywords)")
+                            product['category_id'] = suggested_category
+                        else:
+                            print(f"  Keeping Category 3 (low keyword confidence: {keyword_matches})")
+                    else:
+                        print(f"  Keeping Category 3 (no specific keyword guidance)")
+        
+        # Final aggressive override for solar products that might have been missed
+        print(f"\n🔍 Final category verification:")
+        for product in data['products']:
+            product_name = product.get('name', '')
+            final_category = product.get('category_id')
+            text = f"{product_name}".upper()
             
-        except json.JSONDecodeError as e:
-            print(f"❌ JSON decode error in extract_structured_data: {str(e)}")
-            raise Exception(f"Failed to parse Claude response as JSON: {str(e)}")
-        except Exception as e:
-            print(f"❌ General error in extract_structured_data: {str(e)}")
-            raise Exception(f"Claude API error: {str(e)}")
+            # Check for obvious solar terms and force category 6
+            obvious_solar_terms = ["INV.", "SAMLEX", "ONDULA", "SENOIDAL", "MODIFICADA", "BAT CICLO", "PROFUNDO", "AGM", "VCD", "AH", "CONTROLADOR SOLAR", "MOD SOL", "FOTOVOLT", "VCC", "POLI", "CEL", "CONECTOR", "MC4"]
+            if any(term in text for term in obvious_solar_terms) and final_category != 6:
+                print(f"  🚨 FINAL OVERRIDE: '{product_name}' → Category 6 (was {final_category})")
+                product['category_id'] = 6
+            elif final_category == 6:
+                print(f"  ✅ '{product_name}' → Category 6 (correct)")
+            else:
+                print(f"  📋 '{product_name}' → Category {final_category}")
+        
+        # Debug: Print the extracted data
+        print("\nExtracted data from Claude:")
+        print(json.dumps(data, indent=2))
+        print("✅ Returning structured data successfully")
+        
+        return data
 
     def get_or_create_supplier(self, session: Session, supplier_info: Dict) -> tuple[Supplier, Dict]:
         """Check if supplier exists by RFC or name, create if not. Returns supplier and detection info."""
@@ -990,6 +997,36 @@ Respond only with the JSON object, no extra explanation.""".replace(
         print(f"🔍 Processing quotation: {file_path}")
         print("=" * 50)
         
+        extracted_text = self.extract_text(file_path)
+        return self.process_text(extracted_text, category_id)
+
+    def process_text(self, text: str, category_id: Optional[int] = None) -> Dict:
+        """
+        Process quotation text that is already in memory (WhatsApp conversations, pasted data).
+        
+        Args:
+            text: Quotation text
+            category_id: Optional product category ID. If not provided, will be determined automatically.
+            
+        Returns:
+            Dict with processing results including SKU information
+        """
+        text = text.strip()
+        if not text:
+            raise ValueError("No text could be extracted from the file")
+        print(f"🔍 Processing {len(text)} characters of text")
+        
+        categories = self.load_categories()
+        
+        # Use AI to extract structured data (including SKU suggestions and category selection)
+        print("🔍 Starting AI extraction...")
+        structured_data = self.extract_structured_data(text, categories)
+        print("✓ Structured data extracted using Claude AI")
+        
+        return self.save_structured_data(structured_data, category_id)
+
+    def extract_text(self, file_path: str) -> str:
+        """Extract the text of a quotation file (PDF, image or TXT)."""
         try:
             # Extract text from file (PDF, image, or text)
             print("🔍 Extracting text from file...")
@@ -1014,21 +1051,41 @@ Respond only with the JSON object, no extra explanation.""".replace(
             print(f"❌ Error extracting text: {str(e)}")
             raise
         
-        print("🔍 Creating database session...")
+        return extracted_text
+
+    def load_categories(self) -> List[Dict]:
+        """Load the product categories offered to Claude, in a short-lived session."""
         session = SessionLocal()
         try:
-            # Get available categories
             print("🔍 Getting categories...")
             categories = self.get_categories(session)
-            print(f"🔍 Found {len(categories)} categories")
-            if not categories:
-                raise ValueError("No product categories found in the database")
-            
-            # Use AI to extract structured data (including SKU suggestions and category selection)
-            print("🔍 Starting AI extraction...")
-            structured_data = self.extract_structured_data(extracted_text, categories)
-            print("✓ Structured data extracted using Claude AI")
+        finally:
+            session.close()
+        print(f"🔍 Found {len(categories)} categories")
+        if not categories:
+            raise ValueError("No product categories found in the database")
+        return categories
+
+    def save_structured_data(self, structured_data: Dict, category_id: Optional[int] = None) -> Dict:
+        """
+        Create the suppliers and supplier products of Claude's extraction in one transaction.
+        
+        Saves run one at a time per process; text extraction and the Claude call stay parallel.
+        
+        Args:
+            structured_data: Output of extract_structured_data / parse_extraction_response
+            category_id: Optional category ID that overrides the one chosen per product
             
+        Returns:
+            Dict with processing results including SKU information
+        """
+        with _save_lock:
+            return self._save_structured_data(structured_data, category_id)
+
+    def _save_structured_data(self, structured_data: Dict, category_id: Optional[int] = None) -> Dict:
+        print("🔍 Creating database session...")
+        session = SessionLocal()
+        try:
             results = {
                 "suppliers": {},  # Track multiple suppliers by name
                 "products_processed": 0,
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from typing import List
 from models import get_db, ProductCategory
 from auth import verify_google_token
 
-router = APIRouter(prefix="/categories", tags=["categories"])
+router = APIRouter(prefix="/categories", tags=["categories"], default_response_class=ORJSONResponse)
 
 # GET /categories - PUBLIC for quotation web app
 @router.get("/")
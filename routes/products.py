@@ -1,14 +1,104 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, case, false, literal
-from typing import List, Optional, Any
-from pydantic import BaseModel
-from datetime import datetime
-from models import get_db, Product, Supplier, SupplierProduct, ProductUnit
-from services.price_calculator import enrich_products_with_calculated_prices, get_product_display_price, calculate_product_price_with_currency, get_lowest_supplier_cost_with_currency
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, joinedload, load_only, raiseload
+from sqlalchemy import func, case, false, literal, exists, tuple_, update, insert, select, lambda_stmt, bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import List, Optional, Any, Literal
+from pydantic import BaseModel, ConfigDict
+from datetime import datetime, timezone
+import io
+import operator
+import re
+from itertools import islice
+from collections import Counter, namedtuple
+import orjson
+from models import get_db, SessionLocal, Product, Supplier, SupplierProduct, ProductUnit
+from services.price_calculator import enrich_products_with_calculated_prices, get_product_display_price, get_lowest_supplier_costs_with_currency, TOTAL_SHIPPING_COST
 from auth import verify_google_token
+from utils.pagination import encode_cursor, decode_cursor, decode_datetime
+from utils.ttl_cache import TTLCache
+from utils.responses import FastORJSONResponse, orjson_default
 
-router = APIRouter(prefix="/products", tags=["products"], dependencies=[Depends(verify_google_token)])
+router = APIRouter(
+    prefix="/products",
+    tags=["products"],
+    dependencies=[Depends(verify_google_token)],
+    default_response_class=FastORJSONResponse,
+)
+
+# Columns returned for every Product payload. attrgetter pulls them in one C-level call
+# instead of a fresh 17-key dict literal per row.
+_PRODUCT_FIELDS = (
+    "id", "name", "description", "category_id", "base_sku", "iva", "unit", "package_size",
+    "sku", "price", "stock", "specifications", "default_margin", "is_active",
+    "archived_at", "created_at", "last_updated",
+)
+_get_product_attrs = operator.attrgetter(*_PRODUCT_FIELDS)
+# The same columns as SQL expressions, for UPDATE ... RETURNING
+_PRODUCT_COLUMNS = tuple(getattr(Product, f) for f in _PRODUCT_FIELDS)
+# List views defer the (often large) specifications JSON column
+_PRODUCT_SUMMARY_FIELDS = tuple(f for f in _PRODUCT_FIELDS if f != "specifications")
+_get_product_summary_attrs = operator.attrgetter(*_PRODUCT_SUMMARY_FIELDS)
+# Extra columns _serialize_product_with_pricing reads
+_PRODUCT_PRICING_FIELDS = ("calculated_price", "embedded")
+_PRODUCT_LIST_COLUMNS = tuple(getattr(Product, f) for f in _PRODUCT_FIELDS + _PRODUCT_PRICING_FIELDS)
+_PRODUCT_SUMMARY_LIST_COLUMNS = tuple(getattr(Product, f) for f in _PRODUCT_SUMMARY_FIELDS + _PRODUCT_PRICING_FIELDS)
+
+def _serialize_product(p, include_specs: bool = True) -> dict:
+    """
+    Serialize the stored columns of a Product.
+
+    Values are left as loaded (ProductUnit, Decimal): orjson_default and
+    jsonable_encoder convert them when the response is encoded.
+    """
+    if include_specs:
+        return dict(zip(_PRODUCT_FIELDS, _get_product_attrs(p)))
+    return dict(zip(_PRODUCT_SUMMARY_FIELDS, _get_product_summary_attrs(p)))
+
+def _needs_supplier_currency(p) -> bool:
+    """Whether the pricing currency of `p` comes from its lowest-cost supplier."""
+    return p.price is not None or (p.calculated_price is not None and bool(p.default_margin))
+
+def _lowest_supplier_costs(products, db: Session) -> dict:
+    """product_id -> (lowest_cost, currency) for the products that need it, in one query."""
+    return get_lowest_supplier_costs_with_currency([p.id for p in products if _needs_supplier_currency(p)], db)
+
+def _serialize_product_with_pricing(p, db: Session, include_specs: bool = True, lowest_costs: Optional[dict] = None) -> dict:
+    """
+    Serialize a Product for read endpoints, falling back to the cached calculated price.
+
+    Pass `lowest_costs` (from _lowest_supplier_costs) when serializing many products so
+    the supplier currencies are fetched in one query instead of one per product.
+    """
+    if lowest_costs is None:
+        lowest_costs = _lowest_supplier_costs((p,), db)
+
+    # Get currency for calculated prices or check supplier currencies for manual prices
+    calculated_currency = None
+    lowest_cost_currency = lowest_costs.get(p.id)
+    if p.price is None and p.calculated_price is not None:
+        # Currency of the lowest-cost supplier the price is calculated from
+        if lowest_cost_currency and p.default_margin:
+            _, calculated_currency = lowest_cost_currency
+    elif p.price is not None:
+        # For manual prices, check if there are suppliers with different currencies
+        # Get the currency of the lowest-cost supplier
+        if lowest_cost_currency:
+            _, calculated_currency = lowest_cost_currency
+        else:
+            # If no suppliers, default to MXN
+            calculated_currency = 'MXN'
+
+    data = _serialize_product(p, include_specs)
+    calculated_price = p.calculated_price
+    if data["price"] is None:
+        data["price"] = calculated_price
+    data["calculated_price"] = calculated_price
+    data["is_calculated_price"] = p.price is None and p.calculated_price is not None
+    data["currency"] = calculated_currency  # Currency of the calculated price
+    data["embedded"] = p.embedded
+    return data
 
 # Pydantic models for request/response
 class ProductBase(BaseModel):
@@ -52,8 +142,7 @@ class ProductResponse(ProductBase):
     created_at: datetime
     last_updated: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class SupplierProductBase(BaseModel):
     # Supplier relationship
@@ -133,8 +222,111 @@ class SupplierProductResponse(SupplierProductBase):
     created_at: datetime
     last_updated: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+# SupplierProductResponse documents these endpoints; rows are serialized directly
+# instead of being re-validated through it on every response.
+_SUPPLIER_PRODUCT_FIELDS = tuple(SupplierProductResponse.model_fields)
+_get_supplier_product_attrs = operator.attrgetter(*_SUPPLIER_PRODUCT_FIELDS)
+_SUPPLIER_PRODUCT_COLUMNS = tuple(getattr(SupplierProduct, f) for f in _SUPPLIER_PRODUCT_FIELDS)
+
+def _serialize_supplier_product(sp) -> dict:
+    """Serialize a SupplierProduct with the SupplierProductResponse fields (Decimals left for the encoder)."""
+    return dict(zip(_SUPPLIER_PRODUCT_FIELDS, _get_supplier_product_attrs(sp)))
+
+# Worker-local cache of encoded GET /products/{id} responses, keyed by (product_id, include_archived).
+# The payload includes the lowest supplier cost's currency, so any product or supplier
+# product write in this router clears the whole cache; other workers catch up within the TTL.
+_product_cache = TTLCache(maxsize=1024, ttl=30)
+
+def _update_returning(db: Session, model, row_id: int, changes: dict, columns):
+    """
+    Apply `changes` to one row with a single UPDATE ... RETURNING `columns` and commit.
+
+    Returns the returned row, or None if no row has that id. With no changes the
+    row is just selected, so callers can serialize the result either way.
+    """
+    if not changes:
+        return db.query(*columns).filter(model.id == row_id).first()
+    row = db.execute(
+        update(model)
+        .where(model.id == row_id)
+        .values(**changes)
+        .returning(*columns)
+        .execution_options(synchronize_session=False)
+    ).first()
+    db.commit()
+    _product_cache.clear()
+    return row
+
+# Listings above this size are streamed instead of built in memory
+STREAM_THRESHOLD = 500
+
+# GET /supplier-products row shape: (key, SQL expression), in response order
+_ALL_SUPPLIER_PRODUCT_SELECT = (
+    ("id", SupplierProduct.id),
+    ("supplier_id", SupplierProduct.supplier_id),
+    ("supplier_name", func.coalesce(Supplier.name, "Unknown")),
+    ("product_id", SupplierProduct.product_id),
+    # Use SupplierProduct fields directly (new standalone structure), Product as fallback
+    ("product_name", func.coalesce(func.nullif(SupplierProduct.name, ""), Product.name, "Unknown")),
+    ("product_sku", func.coalesce(func.nullif(SupplierProduct.sku, ""), Product.sku, "Unknown")),
+    ("name", SupplierProduct.name),
+    ("sku", SupplierProduct.sku),
+    ("description", SupplierProduct.description),
+    ("category_id", SupplierProduct.category_id),
+    ("unit", SupplierProduct.unit),
+    ("package_size", SupplierProduct.package_size),
+    ("iva", SupplierProduct.iva),
+    ("specifications", SupplierProduct.specifications),
+    ("default_margin", func.nullif(SupplierProduct.default_margin, 0)),
+    ("supplier_sku", func.coalesce(SupplierProduct.supplier_sku, "")),
+    ("cost", func.nullif(SupplierProduct.cost, 0)),
+    ("currency", func.coalesce(SupplierProduct.currency, "MXN")),
+    ("shipping_cost", TOTAL_SHIPPING_COST),
+    ("total_cost", func.coalesce(SupplierProduct.cost, 0) + TOTAL_SHIPPING_COST),
+    ("shipping_method", SupplierProduct.shipping_method),
+    ("stock", func.coalesce(SupplierProduct.stock, 0)),
+    ("lead_time_days", func.coalesce(SupplierProduct.lead_time_days, 0)),
+    ("is_active", SupplierProduct.is_active),
+    ("created_at", SupplierProduct.created_at),
+    ("last_updated", SupplierProduct.last_updated),
+)
+_ALL_SUPPLIER_PRODUCT_KEYS = tuple(key for key, _ in _ALL_SUPPLIER_PRODUCT_SELECT)
+_ALL_SUPPLIER_PRODUCT_COLUMNS = tuple(expr.label(key) for key, expr in _ALL_SUPPLIER_PRODUCT_SELECT)
+
+# Column side of the GET /supplier-products search, built once at import:
+# unaccent(coalesce(col, '')) and the same with all whitespace removed
+_SP_SEARCH_UNACCENTED = {
+    key: func.unaccent(func.coalesce(column, ''))
+    for key, column in (
+        ("name", SupplierProduct.name),
+        ("description", SupplierProduct.description),
+        ("sku", SupplierProduct.sku),
+        ("supplier_sku", SupplierProduct.supplier_sku),
+        ("supplier_name", Supplier.name),
+    )
+}
+_SP_SEARCH_NORMALIZED = {
+    key: func.regexp_replace(expr, r'\s+', '', 'g') for key, expr in _SP_SEARCH_UNACCENTED.items()
+}
+
+def _stream_all_supplier_products(query, total_count: int):
+    """
+    Yield the get_all_supplier_products JSON envelope row by row from a server-side cursor.
+
+    Runs on its own session, like _stream_products.
+    """
+    db = SessionLocal()
+    try:
+        yield b'{"success":true,"data":{"supplier_products":['
+        for i, row in enumerate(query.with_session(db).yield_per(STREAM_THRESHOLD)):
+            if i:
+                yield b","
+            yield orjson.dumps(dict(zip(_ALL_SUPPLIER_PRODUCT_KEYS, row)), default=orjson_default)
+        yield b'],"total":' + orjson.dumps(total_count) + b'}}'
+    finally:
+        db.close()
 
 # GET /supplier-products - List all supplier-product relationships
 @router.get("/supplier-products")
@@ -146,13 +338,17 @@ def get_all_supplier_products(
     is_active: Optional[bool] = Query(None),
     include_archived: bool = Query(False),
     search: Optional[str] = Query(None, description="Search across product name, description, SKU, supplier SKU, and supplier name"),
+    stream: bool = Query(False, description=f"Stream the response (always on for limit > {STREAM_THRESHOLD})"),
     db: Session = Depends(get_db)
 ):
     """Get all supplier-product relationships"""
     try:
-        query = db.query(SupplierProduct).options(
-            joinedload(SupplierProduct.supplier),
-            joinedload(SupplierProduct.product)
+        # Plain rows in response shape; fallbacks and shipping totals are computed in SQL
+        query = (
+            db.query(*_ALL_SUPPLIER_PRODUCT_COLUMNS)
+            .select_from(SupplierProduct)
+            .outerjoin(Supplier, SupplierProduct.supplier_id == Supplier.id)
+            .outerjoin(Product, SupplierProduct.product_id == Product.id)
         )
         
         # Filter archived
@@ -173,18 +369,19 @@ def get_all_supplier_products(
             normalized_search = func.regexp_replace(func.unaccent(search), r'\s+', '', 'g')
             
             # Normalize fields (handle NULL with COALESCE)
-            normalized_name = func.regexp_replace(func.unaccent(func.coalesce(SupplierProduct.name, '')), r'\s+', '', 'g')
-            normalized_description = func.regexp_replace(func.unaccent(func.coalesce(SupplierProduct.description, '')), r'\s+', '', 'g')
-            normalized_sku = func.regexp_replace(func.unaccent(func.coalesce(SupplierProduct.sku, '')), r'\s+', '', 'g')
-            normalized_supplier_sku = func.regexp_replace(func.unaccent(func.coalesce(SupplierProduct.supplier_sku, '')), r'\s+', '', 'g')
-            normalized_supplier_name = func.regexp_replace(func.unaccent(func.coalesce(Supplier.name, '')), r'\s+', '', 'g')
+            normalized_name = _SP_SEARCH_NORMALIZED["name"]
+            normalized_description = _SP_SEARCH_NORMALIZED["description"]
+            normalized_sku = _SP_SEARCH_NORMALIZED["sku"]
+            normalized_supplier_sku = _SP_SEARCH_NORMALIZED["supplier_sku"]
+            normalized_supplier_name = _SP_SEARCH_NORMALIZED["supplier_name"]
             
             # Exact matches (handle NULL with COALESCE)
-            name_exact = func.unaccent(func.coalesce(SupplierProduct.name, '')).ilike(func.unaccent(f"%{search}%"))
-            description_exact = func.unaccent(func.coalesce(SupplierProduct.description, '')).ilike(func.unaccent(f"%{search}%"))
-            sku_exact = func.unaccent(func.coalesce(SupplierProduct.sku, '')).ilike(func.unaccent(f"%{search}%"))
-            supplier_sku_exact = func.unaccent(func.coalesce(SupplierProduct.supplier_sku, '')).ilike(func.unaccent(f"%{search}%"))
-            supplier_name_exact = func.unaccent(func.coalesce(Supplier.name, '')).ilike(func.unaccent(f"%{search}%"))
+            search_pattern = func.unaccent(f"%{search}%")
+            name_exact = _SP_SEARCH_UNACCENTED["name"].ilike(search_pattern)
+            description_exact = _SP_SEARCH_UNACCENTED["description"].ilike(search_pattern)
+            sku_exact = _SP_SEARCH_UNACCENTED["sku"].ilike(search_pattern)
+            supplier_sku_exact = _SP_SEARCH_UNACCENTED["supplier_sku"].ilike(search_pattern)
+            supplier_name_exact = _SP_SEARCH_UNACCENTED["supplier_name"].ilike(search_pattern)
             
             # Fuzzy matches with space normalization - Increased threshold for stricter matching
             name_fuzzy = func.similarity(normalized_name, normalized_search) > 0.5
@@ -216,7 +413,7 @@ def get_all_supplier_products(
                 vector_similarity = literal(0)
                 vector_match = false()
 
-            query = query.join(SupplierProduct.supplier).filter(
+            query = query.filter(
                 name_exact | description_exact | sku_exact | supplier_sku_exact | supplier_name_exact |
                 name_fuzzy | description_fuzzy | sku_fuzzy | supplier_sku_fuzzy | supplier_name_fuzzy |
                 name_word | description_word | sku_word | supplier_sku_word | supplier_name_word |
@@ -238,78 +435,96 @@ def get_all_supplier_products(
         total_count = query.count()
         
         # Apply pagination
-        supplier_products = query.offset(skip).limit(limit).all()
+        query = query.offset(skip).limit(limit)
+        if stream or limit > STREAM_THRESHOLD:
+            return StreamingResponse(_stream_all_supplier_products(query, total_count), media_type="application/json")
+        supplier_products = query.all()
         
-        # Build response
-        result = []
-        for sp in supplier_products:
-            try:
-                # Calculate total shipping cost
-                if hasattr(sp, 'shipping_method') and sp.shipping_method == 'DIRECT':
-                    total_shipping = float(getattr(sp, 'shipping_cost_direct', 0) or 0)
-                else:
-                    total_shipping = float(
-                        (getattr(sp, 'shipping_stage1_cost', 0) or 0) +
-                        (getattr(sp, 'shipping_stage2_cost', 0) or 0) +
-                        (getattr(sp, 'shipping_stage3_cost', 0) or 0) +
-                        (getattr(sp, 'shipping_stage4_cost', 0) or 0)
-                    )
-                
-                item = {
-                    "id": sp.id,
-                    "supplier_id": sp.supplier_id,
-                    "supplier_name": sp.supplier.name if sp.supplier else "Unknown",
-                    "product_id": sp.product_id,
-                    # Use SupplierProduct fields directly (new standalone structure)
-                    "product_name": sp.name or (sp.product.name if sp.product else "Unknown"),
-                    "product_sku": sp.sku or (sp.product.sku if sp.product else "Unknown"),
-                    "name": sp.name,  # Add direct name field
-                    "sku": sp.sku,  # Add direct sku field
-                    "description": sp.description,
-                    "category_id": sp.category_id,
-                    "unit": sp.unit,
-                    "package_size": sp.package_size,
-                    "iva": sp.iva,
-                    "specifications": sp.specifications,
-                    "default_margin": float(sp.default_margin) if sp.default_margin else None,
-                    "supplier_sku": sp.supplier_sku or "",
-                    "cost": float(sp.cost) if sp.cost else None,
-                    "currency": sp.currency or 'MXN',  # Include currency information
-                    "shipping_cost": total_shipping,
-                    "total_cost": float(sp.cost or 0) + total_shipping,
-                    "shipping_method": getattr(sp, 'shipping_method', 'OCURRE'),
-                    "stock": sp.stock or 0,
-                    "lead_time_days": sp.lead_time_days or 0,
-                    "is_active": sp.is_active,
-                    "created_at": sp.created_at,
-                    "last_updated": sp.last_updated
-                }
-                result.append(item)
-            except Exception as e:
-                # Skip problematic items but log the issue
-                print(f"Error processing supplier product {sp.id}: {str(e)}")
-                continue
+        result = [dict(zip(_ALL_SUPPLIER_PRODUCT_KEYS, row)) for row in supplier_products]
         
-        return {
+        return FastORJSONResponse({
             "success": True,
             "data": {
                 "supplier_products": result,
                 "total": total_count
             }
-        }
+        })
     except Exception as e:
         from fastapi import HTTPException
         raise HTTPException(status_code=500, detail=f"Error fetching supplier products: {str(e)}")
 
+# Minimum trigram (word) similarity for the GET /products fuzzy name search
+NAME_SIMILARITY_THRESHOLD = 0.2
+# Column side of the name search, built once at import; these match the
+# trigram expression indexes on product.name
+_UNACCENTED_PRODUCT_NAME = func.immutable_unaccent(Product.name)
+_NORMALIZED_PRODUCT_NAME = func.regexp_replace(_UNACCENTED_PRODUCT_NAME, r'\s+', '', 'g')
+
+def _set_name_search_thresholds(db: Session) -> None:
+    """Set the pg_trgm `%` / `<%` operator thresholds for the current transaction."""
+    db.execute(select(
+        func.set_config("pg_trgm.similarity_threshold", str(NAME_SIMILARITY_THRESHOLD), True),
+        func.set_config("pg_trgm.word_similarity_threshold", str(NAME_SIMILARITY_THRESHOLD), True),
+    ))
+
+def _products_next_cursor(last, keyset: Optional[str]) -> str:
+    """Cursor for the page after `last` under the given keyset order ("created_at" or "name")."""
+    if keyset == "name":
+        return encode_cursor(last.name, last.id)
+    return encode_cursor(last.created_at, last.id)
+
+def _stream_products(query, include_specs: bool, keyset: Optional[str], limit: int, name_search: bool = False):
+    """
+    Yield the get_products JSON envelope row by row from a server-side cursor.
+
+    Runs on its own session: the request-scoped one may be closed before the
+    response body has finished streaming.
+    """
+    db = SessionLocal()
+    try:
+        if name_search:
+            _set_name_search_thresholds(db)
+        yield b'{"success":true,"data":['
+        last = None
+        count = 0
+        has_more = False
+        # The query fetches limit + 1 rows; the extra one only signals has_more.
+        # Supplier currencies are looked up once per batch of rows.
+        rows = iter(query.with_session(db).yield_per(STREAM_THRESHOLD))
+        for batch in iter(lambda: list(islice(rows, STREAM_THRESHOLD)), []):
+            lowest_costs = _lowest_supplier_costs(batch, db)
+            for p in batch:
+                if count == limit:
+                    has_more = True
+                    break
+                if count:
+                    yield b","
+                yield orjson.dumps(_serialize_product_with_pricing(p, db, include_specs, lowest_costs), default=orjson_default)
+                last = p
+                count += 1
+            if has_more:
+                break
+        next_cursor = None
+        if keyset and has_more:
+            next_cursor = _products_next_cursor(last, keyset)
+        yield (
+            b'],"next_cursor":' + orjson.dumps(next_cursor)
+            + b',"has_more":' + orjson.dumps(has_more)
+            + b',"error":null,"message":null}'
+        )
+    finally:
+        db.close()
+
 # GET /products with advanced filtering and JSON wrapper - PUBLIC for quotation web app
 # DEPRECATED: This endpoint queries the old Product table. New implementations should use /supplier-products
 # Kept for backward compatibility with existing production app
 @router.get("/")
-@router.get("")  # Handle both /products and /products/ explicitly
+@router.get("", include_in_schema=False)  # Handle both /products and /products/ explicitly (no redirect: CORS preflights can't follow one)
 def get_products(
     id: Optional[int] = Query(None),
     name: Optional[str] = Query(None),
     sku: Optional[str] = Query(None),
+    sku_match: Literal["contains", "prefix", "exact"] = Query("contains", description="How `sku` is matched against sku/base_sku (case-insensitive)"),
     category_id: Optional[int] = Query(None),
     supplier_id: Optional[int] = Query(None),
     is_active: Optional[bool] = Query(None),
@@ -317,13 +532,31 @@ def get_products(
     max_stock: Optional[int] = Query(None, description="Maximum stock level"),
     currency: Optional[str] = Query(None, description="Filter by currency (MXN, USD, EUR)"),
     include_archived: bool = False,
-    skip: int = 0,
+    include_specs: bool = Query(False, description="Include the specifications JSON in each product"),
+    skip: int = Query(0, description="Deprecated: prefer `after` (name ascending or sort_by=created_at&sort_order=desc)"),
     limit: int = 100,
     sort_by: Optional[str] = Query(None),
     sort_order: Optional[str] = Query("asc"),
+    after: Optional[str] = Query(None, description="Keyset cursor (next_cursor of the previous page)"),
+    stream: bool = Query(False, description=f"Stream the response (always on for limit > {STREAM_THRESHOLD})"),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Product)
+    # Name-ascending (the default) and newest-first listings page by keyset on
+    # (name, id) / (created_at, id) so deep pages don't scan and discard `skip` rows.
+    # A name search orders by relevance, so it keeps OFFSET paging.
+    keyset = None
+    if not name:
+        if sort_by in (None, "name") and sort_order == "asc":
+            keyset = "name"
+        elif sort_by == "created_at" and sort_order == "desc":
+            keyset = "created_at"
+    if after and not keyset:
+        raise HTTPException(status_code=400, detail="Cursor pagination requires name ascending or sort_by=created_at&sort_order=desc order, without a name search")
+
+    # Select plain rows of only the columns the serializer reads (specifications, often
+    # large, only on request): no ORM instances, identity map or change tracking for a
+    # read-only listing.
+    query = db.query(*(_PRODUCT_LIST_COLUMNS if include_specs else _PRODUCT_SUMMARY_LIST_COLUMNS))
     
     # Filter out archived records by default
     if not include_archived:
@@ -331,18 +564,23 @@ def get_products(
     if id:
         query = query.filter(Product.id == id)
     if name:
+        # immutable_unaccent (see migration 8a5d3f7c1b46) matches the trigram expression
+        # indexes on product.name; plain unaccent() can't be indexed.
         # Normalize spaces for better fuzzy matching
-        normalized_search = func.regexp_replace(func.unaccent(name), r'\s+', '', 'g')  # Remove all spaces
-        normalized_product = func.regexp_replace(func.unaccent(Product.name), r'\s+', '', 'g')
+        normalized_search = func.immutable_unaccent(re.sub(r'\s+', '', name))  # Remove all spaces
+        normalized_product = _NORMALIZED_PRODUCT_NAME
         
         # First try exact match with unaccent and space handling
-        exact_match = func.unaccent(Product.name).ilike(func.unaccent(f"%{name}%"))
+        exact_match = _UNACCENTED_PRODUCT_NAME.ilike(func.immutable_unaccent(f"%{name}%"))
         
-        # Fuzzy matching with space normalization and lower threshold
-        fuzzy_match = func.similarity(normalized_product, normalized_search) > 0.2
+        # Fuzzy matching with space normalization and lower threshold. The % and <%
+        # operators (unlike similarity() > x) can use the GIN indexes; their thresholds
+        # are set for this transaction.
+        _set_name_search_thresholds(db)
+        fuzzy_match = normalized_product.op("%")(normalized_search)
         
         # Also try word similarity (handles "malla sombra" vs "mallasombra")
-        word_match = func.word_similarity(normalized_search, normalized_product) > 0.2
+        word_match = normalized_search.op("<%")(normalized_product)
         
         query = query.filter(exact_match | fuzzy_match | word_match)
         
@@ -357,18 +595,38 @@ def get_products(
         )
         query = query.order_by(exact_score.desc())
     if sku:
-        like_pattern = f"%{sku}%"
-        # Filter by either base_sku or sku
-        query = query.filter(
-            (Product.base_sku.ilike(like_pattern)) |
-            (Product.sku.ilike(like_pattern))
-        )
+        if sku_match == "contains":
+            like_pattern = f"%{sku}%"
+            # Filter by either base_sku or sku (trigram GIN indexes)
+            query = query.filter(
+                (Product.base_sku.ilike(like_pattern)) |
+                (Product.sku.ilike(like_pattern))
+            )
+        else:
+            # Exact/prefix lookups use the lower(...) text_pattern_ops btree indexes
+            sku_lower = sku.lower()
+            if sku_match == "exact":
+                query = query.filter(
+                    (func.lower(Product.base_sku) == sku_lower) |
+                    (func.lower(Product.sku) == sku_lower)
+                )
+            else:
+                escaped = sku_lower.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                query = query.filter(
+                    (func.lower(Product.base_sku).like(escaped + "%", escape="\\")) |
+                    (func.lower(Product.sku).like(escaped + "%", escape="\\"))
+                )
     if category_id:
         query = query.filter(Product.category_id == category_id)
     if is_active is not None:
         query = query.filter(Product.is_active == is_active)
     if supplier_id:
-        query = query.join(Product.supplier_products).filter(SupplierProduct.supplier_id == supplier_id)
+        # Semi-join: one row per product no matter how many supplier links match
+        query = query.filter(exists().where(
+            SupplierProduct.product_id == Product.id,
+            SupplierProduct.supplier_id == supplier_id,
+            SupplierProduct.archived_at.is_(None)
+        ))
     if min_stock is not None:
         query = query.filter(Product.stock >= min_stock)
     if max_stock is not None:
@@ -385,10 +643,33 @@ def get_products(
     if not sort_by:
         sort_by = "name"
         
-    if sort_by == "name":
+    if keyset == "name":
+        if after:
+            try:
+                after_name, after_id = decode_cursor(after, 2)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            # NULL names sort last in ascending order; a row comparison with NULL is never true
+            if after_name is None:
+                query = query.filter(Product.name.is_(None), Product.id > after_id)
+            else:
+                query = query.filter(
+                    (tuple_(Product.name, Product.id) > tuple_(after_name, after_id)) | Product.name.is_(None)
+                )
+        query = query.order_by(Product.name.asc().nulls_last(), Product.id.asc())
+    elif sort_by == "name":
         query = query.order_by(Product.name.asc() if sort_order == "asc" else Product.name.desc())
     elif sort_by == "price":
         query = query.order_by(Product.price.asc() if sort_order == "asc" else Product.price.desc())
+    elif keyset == "created_at":
+        if after:
+            try:
+                after_created_at, after_id = decode_cursor(after, 2)
+                after_created_at = decode_datetime(after_created_at)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            query = query.filter(tuple_(Product.created_at, Product.id) < tuple_(after_created_at, after_id))
+        query = query.order_by(Product.created_at.desc(), Product.id.desc())
     elif sort_by == "created_at":
         query = query.order_by(Product.created_at.asc() if sort_order == "asc" else Product.created_at.desc())
     elif sort_by == "last_updated":
@@ -402,53 +683,47 @@ def get_products(
         # Default fallback to name sorting
         query = query.order_by(Product.name.asc())
     
-    products = query.offset(skip).limit(limit).all()
-    data = []
+    # One extra row tells whether another page exists without a COUNT
+    query = query.offset(skip).limit(limit + 1)
+    if stream or limit > STREAM_THRESHOLD:
+        return StreamingResponse(_stream_products(query, include_specs, keyset, limit, name_search=bool(name)), media_type="application/json")
     
-    for p in products:
-        # Get currency for calculated prices or check supplier currencies for manual prices
-        calculated_currency = None
-        if p.price is None and p.calculated_price is not None:
-            # Try to get currency for calculated price
-            price_currency = calculate_product_price_with_currency(p, db)
-            if price_currency:
-                _, calculated_currency = price_currency
-        elif p.price is not None:
-            # For manual prices, check if there are suppliers with different currencies
-            # Get the currency of the lowest-cost supplier
-            lowest_cost_currency = get_lowest_supplier_cost_with_currency(p.id, db)
-            if lowest_cost_currency:
-                _, calculated_currency = lowest_cost_currency
-            else:
-                # If no suppliers, default to MXN
-                calculated_currency = 'MXN'
-        
-        product_data = {
-            "id": p.id,
-            "name": p.name,
-            "description": p.description,
-            "category_id": p.category_id,
-            "base_sku": p.base_sku,
-            "iva": p.iva,
-            "unit": p.unit.value if p.unit else None,
-            "package_size": p.package_size,
-            "sku": p.sku,
-            "price": float(p.price) if p.price is not None else (float(p.calculated_price) if p.calculated_price is not None else None),
-            "stock": p.stock,
-            "specifications": p.specifications,
-            "default_margin": float(p.default_margin) if p.default_margin is not None else None,
-            "calculated_price": float(p.calculated_price) if p.calculated_price is not None else None,
-            "is_calculated_price": p.price is None and p.calculated_price is not None,
-            "currency": calculated_currency,  # Currency of the calculated price
-            "embedded": p.embedded,
-            "is_active": p.is_active,
-            "archived_at": p.archived_at,
-            "created_at": p.created_at,
-            "last_updated": p.last_updated,
-        }
-        data.append(product_data)
+    products = query.all()
+    has_more = len(products) > limit
+    products = products[:limit]
+    lowest_costs = _lowest_supplier_costs(products, db)
+    data = [_serialize_product_with_pricing(p, db, include_specs, lowest_costs) for p in products]
+
+    next_cursor = None
+    if keyset and has_more:
+        next_cursor = _products_next_cursor(products[-1], keyset)
     
-    return {"success": True, "data": data, "error": None, "message": None}
+    return FastORJSONResponse({"success": True, "data": data, "next_cursor": next_cursor, "has_more": has_more, "error": None, "message": None})
+
+# Stock views of a SupplierProduct (list, single and bulk updates) share one builder
+_STOCK_ITEM_FIELDS = ("id", "name", "sku", "stock", "cost", "last_updated")
+_get_stock_item_attrs = operator.attrgetter(*_STOCK_ITEM_FIELDS)
+_STOCK_ITEM_COLUMNS = tuple(getattr(SupplierProduct, f) for f in _STOCK_ITEM_FIELDS)
+
+def _serialize_stock_item(sp) -> dict:
+    """Serialize the stock view of a SupplierProduct (cost is exposed as price)."""
+    sp_id, name, sku, stock, cost, last_updated = _get_stock_item_attrs(sp)
+    return {
+        "id": sp_id,
+        "name": name,
+        "sku": sku,
+        "stock": stock,
+        "price": float(cost) if cost else None,  # Using cost as price for now
+        "total_value": float(stock * cost) if stock and cost else None,
+        "last_updated": last_updated,
+    }
+
+# Stock item built from bulk-update values instead of a loaded row
+_StockItemRow = namedtuple("_StockItemRow", _STOCK_ITEM_FIELDS)
+
+_STOCK_LIST_COLUMNS = _STOCK_ITEM_COLUMNS + tuple(getattr(SupplierProduct, f) for f in ("supplier_id", "unit", "currency")) + (
+    Supplier.name.label("supplier_name"),
+)
 
 # GET /products/stock - Get supplier products in stock (must be before /{product_id})
 @router.get("/stock")
@@ -462,8 +737,8 @@ def get_products_in_stock(
     sort_order: Optional[str] = Query(default="asc", description="Sort order: asc or desc")
 ):
     """Get supplier products that are currently in stock (now using SupplierProduct table)"""
-    # Query SupplierProduct directly with supplier relationship
-    query = db.query(SupplierProduct).join(Supplier).filter(
+    # Query SupplierProduct rows with the supplier name joined in (plain rows, no ORM instances)
+    query = db.query(*_STOCK_LIST_COLUMNS).join(Supplier, SupplierProduct.supplier_id == Supplier.id).filter(
         SupplierProduct.archived_at.is_(None),
         SupplierProduct.name.isnot(None)  # Only include products with populated name
     )
@@ -485,8 +760,8 @@ def get_products_in_stock(
     elif sort_by == "supplier":
         order_field = Supplier.name
     elif sort_by == "total_value":
-        # For total_value, calculate stock * cost
-        order_field = SupplierProduct.stock * SupplierProduct.cost
+        # Generated stock * cost column, indexed
+        order_field = SupplierProduct.total_value
     else:
         order_field = SupplierProduct.name  # Default fallback
     
@@ -496,30 +771,24 @@ def get_products_in_stock(
     else:
         query = query.order_by(order_field.asc())
     
-    total = query.count()
-    supplier_products = query.offset(offset).limit(limit).all()
+    # The total rides along as a window column instead of a second COUNT scan;
+    # only a page past the end (no rows to carry it) falls back to counting
+    supplier_products = query.add_columns(func.count().over().label("full_count")).offset(offset).limit(limit).all()
+    if supplier_products:
+        total = supplier_products[0].full_count
+    else:
+        total = query.count() if offset else 0
     
     stock_data = []
     for sp in supplier_products:
-        total_value = None
-        if sp.stock and sp.cost:
-            total_value = float(sp.stock * sp.cost)
-        
-        stock_data.append({
-            "id": sp.id,  # supplier_product id (for updates)
-            "name": sp.name,
-            "sku": sp.sku,
-            "supplier_id": sp.supplier_id,
-            "supplier_name": sp.supplier.name if sp.supplier else "Unknown",
-            "unit": sp.unit or "PIEZA",
-            "stock": sp.stock,
-            "price": float(sp.cost) if sp.cost else None,  # Using cost as price for now
-            "currency": sp.currency or "MXN",
-            "total_value": total_value,
-            "last_updated": sp.last_updated
-        })
+        item = _serialize_stock_item(sp)  # id is the supplier_product id (for updates)
+        item["supplier_id"] = sp.supplier_id
+        item["supplier_name"] = sp.supplier_name
+        item["unit"] = sp.unit or "PIEZA"
+        item["currency"] = sp.currency or "MXN"
+        stock_data.append(item)
     
-    return {
+    return FastORJSONResponse({
         "success": True,
         "data": {
             "products": stock_data,
@@ -529,171 +798,149 @@ def get_products_in_stock(
         },
         "error": None,
         "message": None
-    }
+    })
 
 # GET /products/{product_id} - PUBLIC for quotation web app
 @router.get("/{product_id}")
 def get_product(product_id: int, include_archived: bool = False, db: Session = Depends(get_db)):
-    query = db.query(Product).filter(Product.id == product_id)
+    cache_key = (product_id, include_archived)
+    body = _product_cache.get(cache_key)
+    if body is not None:
+        return Response(body, media_type="application/json")
+    
+    # lambda_stmt caches the built statement and its cache key; product_id becomes a bind param
+    stmt = lambda_stmt(lambda: select(Product).options(raiseload("*")).where(Product.id == product_id))
     
     # Filter out archived records by default
     if not include_archived:
-        query = query.filter(Product.archived_at.is_(None))
+        stmt += lambda s: s.where(Product.archived_at.is_(None))
         
-    product = query.first()
+    product = db.execute(stmt).scalars().first()
     if product is None:
         return {"success": False, "data": None, "error": "Product not found", "message": None}
     
-    # Get currency for calculated prices or check supplier currencies for manual prices
-    calculated_currency = None
-    if product.price is None and product.calculated_price is not None:
-        # Try to get currency for calculated price
-        price_currency = calculate_product_price_with_currency(product, db)
-        if price_currency:
-            _, calculated_currency = price_currency
-    elif product.price is not None:
-        # For manual prices, check if there are suppliers with different currencies
-        # Get the currency of the lowest-cost supplier
-        lowest_cost_currency = get_lowest_supplier_cost_with_currency(product.id, db)
-        if lowest_cost_currency:
-            _, calculated_currency = lowest_cost_currency
-        else:
-            # If no suppliers, default to MXN
-            calculated_currency = 'MXN'
-    
-    data = {
-        "id": product.id,
-        "name": product.name,
-        "description": product.description,
-        "category_id": product.category_id,
-        "base_sku": product.base_sku,
-        "iva": product.iva,
-        "unit": product.unit.value if product.unit else None,
-        "package_size": product.package_size,
-        "sku": product.sku,
-        "price": float(product.price) if product.price is not None else (float(product.calculated_price) if product.calculated_price is not None else None),
-        "stock": product.stock,
-        "specifications": product.specifications,
-        "default_margin": float(product.default_margin) if product.default_margin is not None else None,
-        "calculated_price": float(product.calculated_price) if product.calculated_price is not None else None,
-        "is_calculated_price": product.price is None and product.calculated_price is not None,
-        "currency": calculated_currency,  # Currency of the calculated price
-        "embedded": product.embedded,
-        "is_active": product.is_active,
-        "archived_at": product.archived_at,
-        "created_at": product.created_at,
-        "last_updated": product.last_updated,
-    }
+    data = _serialize_product_with_pricing(product, db)
+    # Encode once; cache hits return the bytes as-is
+    body = orjson.dumps({"success": True, "data": data, "error": None, "message": None}, default=orjson_default)
+    _product_cache.set(cache_key, body)
     
-    return {"success": True, "data": data, "error": None, "message": None}
+    return Response(body, media_type="application/json")
 
 # POST /products - REQUIRES AUTHENTICATION for admin operations
 # DEPRECATED: This endpoint creates records in the old Product table. New implementations should use POST /supplier-products
 # Kept for backward compatibility with existing production app
 @router.post("/")
-@router.post("")  # Handle both /products and /products/ explicitly
+@router.post("", include_in_schema=False)  # Handle both /products and /products/ explicitly (no redirect: CORS preflights can't follow one)
 def create_product(product: ProductCreate, db: Session = Depends(get_db), user: dict = Depends(verify_google_token)):
-    # Check for duplicate SKU
-    existing = db.query(Product).filter(Product.sku == product.sku).first()
-    if existing:
+    # The unique sku constraint does the duplicate check: a conflict inserts nothing and
+    # returns no row, with no race between a pre-SELECT and the INSERT
+    row = db.execute(
+        pg_insert(Product)
+        .values(**product.model_dump())
+        .on_conflict_do_nothing(index_elements=[Product.sku])
+        .returning(*_PRODUCT_COLUMNS)
+    ).first()
+    if row is None:
+        db.rollback()
         return {"success": False, "data": None, "error": "Product with this SKU already exists", "message": None}
-    
-    db_product = Product(**product.model_dump())
-    db.add(db_product)
     db.commit()
-    db.refresh(db_product)
     
-    data = {
-        "id": db_product.id,
-        "name": db_product.name,
-        "description": db_product.description,
-        "category_id": db_product.category_id,
-        "base_sku": db_product.base_sku,
-        "iva": db_product.iva,
-        "unit": db_product.unit.value if db_product.unit else None,
-        "package_size": db_product.package_size,
-        "sku": db_product.sku,
-        "price": float(db_product.price) if db_product.price is not None else None,
-        "stock": db_product.stock,
-        "specifications": db_product.specifications,
-        "default_margin": float(db_product.default_margin) if db_product.default_margin is not None else None,
-        "is_active": db_product.is_active,
-        "archived_at": db_product.archived_at,
-        "created_at": db_product.created_at,
-        "last_updated": db_product.last_updated,
-    }
-    return {"success": True, "data": data, "error": None, "message": None}
+    data = _serialize_product(row)
+    return FastORJSONResponse({"success": True, "data": data, "error": None, "message": None})
+
+# Max products per POST /products/bulk request (one multi-row INSERT)
+BULK_CREATE_LIMIT = 1000
+
+# POST /products/bulk - REQUIRES AUTHENTICATION for admin operations
+@router.post("/bulk")
+def create_products_bulk(products: List[ProductCreate], db: Session = Depends(get_db), user: dict = Depends(verify_google_token)):
+    """Create many products in a single multi-row INSERT ... RETURNING"""
+    if not products:
+        return {"success": True, "data": [], "error": None, "message": None}
+    if len(products) > BULK_CREATE_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_CREATE_LIMIT} products per request")
+    
+    # Check for duplicate SKUs within the batch and against existing products
+    skus = [p.sku for p in products]
+    duplicates = {sku for sku, count in Counter(skus).items() if count > 1}
+    duplicates.update(sku for (sku,) in db.query(Product.sku).filter(Product.sku.in_(skus)))
+    if duplicates:
+        return {"success": False, "data": None, "error": f"Duplicate or existing SKUs: {', '.join(sorted(duplicates))}", "message": None}
+    
+    try:
+        rows = db.execute(
+            insert(Product).values([p.model_dump() for p in products]).returning(*_PRODUCT_COLUMNS)
+        ).all()
+        db.commit()
+    except IntegrityError:
+        # A concurrent insert took one of the SKUs after the check above
+        db.rollback()
+        return {"success": False, "data": None, "error": "Product with this SKU already exists", "message": None}
+    
+    data = [_serialize_product(row) for row in rows]
+    return FastORJSONResponse({"success": True, "data": data, "error": None, "message": f"Created {len(data)} products"})
 
 # PUT /products/{product_id} - REQUIRES AUTHENTICATION for admin operations
 # DEPRECATED: This endpoint updates records in the old Product table. New implementations should use PUT /supplier-products/{id}
 # Kept for backward compatibility with existing production app
 @router.put("/{product_id}")
 def update_product(product_id: int, product: ProductUpdate, db: Session = Depends(get_db), user: dict = Depends(verify_google_token)):
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    if db_product is None:
+    # The unique sku constraint does the duplicate check, with no race between a
+    # pre-SELECT and the UPDATE
+    try:
+        row = _update_returning(db, Product, product_id, product.model_dump(exclude_unset=True), _PRODUCT_COLUMNS)
+    except IntegrityError:
+        db.rollback()
+        return {"success": False, "data": None, "error": "Product with this SKU already exists", "message": None}
+    if row is None:
         return {"success": False, "data": None, "error": "Product not found", "message": None}
     
-    # Check for duplicate SKU if sku is being updated
-    if product.sku and product.sku != db_product.sku:
-        existing = db.query(Product).filter(Product.sku == product.sku).first()
-        if existing:
-            return {"success": False, "data": None, "error": "Product with this SKU already exists", "message": None}
-    
-    for key, value in product.model_dump(exclude_unset=True).items():
-        setattr(db_product, key, value)
-    
-    db.commit()
-    db.refresh(db_product)
-    
-    data = {
-        "id": db_product.id,
-        "name": db_product.name,
-        "description": db_product.description,
-        "category_id": db_product.category_id,
-        "base_sku": db_product.base_sku,
-        "iva": db_product.iva,
-        "unit": db_product.unit.value if db_product.unit else None,
-        "package_size": db_product.package_size,
-        "sku": db_product.sku,
-        "price": float(db_product.price) if db_product.price is not None else None,
-        "stock": db_product.stock,
-        "specifications": db_product.specifications,
-        "default_margin": float(db_product.default_margin) if db_product.default_margin is not None else None,
-        "is_active": db_product.is_active,
-        "archived_at": db_product.archived_at,
-        "created_at": db_product.created_at,
-        "last_updated": db_product.last_updated,
-    }
-    return {"success": True, "data": data, "error": None, "message": None}
+    data = _serialize_product(row)
+    return FastORJSONResponse({"success": True, "data": data, "error": None, "message": None})
 
 # SupplierProduct endpoints - ALL REQUIRE AUTHENTICATION for admin operations
-@router.post("/supplier-product/", response_model=SupplierProductResponse)
-@router.post("/supplier-products", response_model=SupplierProductResponse)  # Add plural endpoint for frontend compatibility
+@router.post("/supplier-product/", responses={200: {"model": SupplierProductResponse}})
+@router.post("/supplier-products", responses={200: {"model": SupplierProductResponse}})  # Add plural endpoint for frontend compatibility
 def create_supplier_product(supplier_product: SupplierProductCreate, db: Session = Depends(get_db), user: dict = Depends(verify_google_token)):
-    # Verify supplier and product exist
-    supplier = db.query(Supplier).filter(Supplier.id == supplier_product.supplier_id).first()
-    product = db.query(Product).filter(Product.id == supplier_product.product_id).first()
+    # Verify supplier and product exist (one round trip, no row payloads)
+    supplier_exists, product_exists = db.query(
+        exists().where(Supplier.id == supplier_product.supplier_id),
+        exists().where(Product.id == supplier_product.product_id)
+    ).one()
     
-    if not supplier or not product:
+    if not supplier_exists or not product_exists:
         raise HTTPException(status_code=404, detail="Supplier or Product not found")
     
-    db_supplier_product = SupplierProduct(**supplier_product.model_dump())
-    db.add(db_supplier_product)
+    # INSERT ... RETURNING hands back the server-set columns, no refresh SELECT
+    row = db.execute(
+        insert(SupplierProduct).values(**supplier_product.model_dump()).returning(*_SUPPLIER_PRODUCT_COLUMNS)
+    ).first()
     db.commit()
-    db.refresh(db_supplier_product)
-    return db_supplier_product
+    _product_cache.clear()
+    return FastORJSONResponse(_serialize_supplier_product(row))
 
 @router.get("/supplier-product/debug")
 def debug_supplier_products(db: Session = Depends(get_db)):
     """Debug endpoint to check supplier-product relationships"""
-    supplier_products = db.query(SupplierProduct).all()
-    products = db.query(Product).all()
-    suppliers = db.query(Supplier).all()
+    # Counts in one round trip; only small samples are loaded, never whole tables
+    total_supplier_products, total_products, total_suppliers = db.query(
+        db.query(func.count(SupplierProduct.id)).scalar_subquery(),
+        db.query(func.count(Product.id)).scalar_subquery(),
+        db.query(func.count(Supplier.id)).scalar_subquery()
+    ).one()
+    
+    supplier_products = db.query(
+        SupplierProduct.id, SupplierProduct.supplier_id, SupplierProduct.product_id,
+        SupplierProduct.cost, SupplierProduct.stock, SupplierProduct.lead_time_days,
+        SupplierProduct.is_active
+    ).order_by(SupplierProduct.id).limit(5).all()
+    products = db.query(Product.id, Product.name, Product.sku, Product.price).order_by(Product.id).limit(5).all()
+    suppliers = db.query(Supplier.id, Supplier.name).order_by(Supplier.id).limit(5).all()
     
     return {
-        "total_supplier_products": len(supplier_products),
-        "total_products": len(products),
-        "total_suppliers": len(suppliers),
+        "total_supplier_products": total_supplier_products,
+        "total_products": total_products,
+        "total_suppliers": total_suppliers,
         "supplier_products": [
             {
                 "id": sp.id,
@@ -703,7 +950,7 @@ def debug_supplier_products(db: Session = Depends(get_db)):
                 "stock": sp.stock,
                 "lead_time_days": sp.lead_time_days,
                 "is_active": sp.is_active
-            } for sp in supplier_products
+            } for sp in supplier_products  # First 5 supplier products
         ],
         "products_sample": [
             {
@@ -711,96 +958,130 @@ def debug_supplier_products(db: Session = Depends(get_db)):
                 "name": p.name,
                 "sku": p.sku,
                 "price": float(p.price) if p.price else None
-            } for p in products[:5]  # First 5 products
+            } for p in products  # First 5 products
         ],
         "suppliers_sample": [
             {
                 "id": s.id,
                 "name": s.name
-            } for s in suppliers[:5]  # First 5 suppliers
+            } for s in suppliers  # First 5 suppliers
         ]
     }
 
+def _stream_supplier_products_ndjson(include_archived: bool):
+    """Yield every supplier product as one JSON line, reading through a server-side cursor."""
+    # Own session: the request-scoped one may be closed before streaming finishes
+    db = SessionLocal()
+    try:
+        stmt = select(*_SUPPLIER_PRODUCT_COLUMNS).order_by(SupplierProduct.id)
+        if not include_archived:
+            stmt = stmt.where(SupplierProduct.archived_at.is_(None))
+        for row in db.execute(stmt.execution_options(yield_per=1000)):
+            yield orjson.dumps(_serialize_supplier_product(row), default=orjson_default) + b"\n"
+    finally:
+        db.close()
+
+# Bulk export: NDJSON, one SupplierProductResponse-shaped object per line
+@router.get("/supplier-product/export")
+def export_supplier_products(include_archived: bool = False):
+    return StreamingResponse(
+        _stream_supplier_products_ndjson(include_archived),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="supplier_products.ndjson"'}
+    )
+
+# Columns of the /supplier-product/ listing, in response key order
+_SUPPLIER_PRODUCT_LIST_FIELDS = (
+    "id", "supplier_id", "product_id", "supplier_sku", "cost", "stock", "lead_time_days",
+    "is_active", "notes", "archived_at", "created_at", "last_updated",
+)
+_SUPPLIER_PRODUCT_LIST_COLUMNS = tuple(getattr(SupplierProduct, f) for f in _SUPPLIER_PRODUCT_LIST_FIELDS)
+
 @router.get("/supplier-product/")
-def get_supplier_products(include_archived: bool = False, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    query = db.query(SupplierProduct)
+def get_supplier_products(
+    include_archived: bool = False,
+    skip: int = Query(0, description="Deprecated: prefer `cursor`"),
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Keyset cursor (X-Next-Cursor header of the previous page)"),
+    db: Session = Depends(get_db)
+):
+    # Plain column rows (no ORM instances, never the embedding vector)
+    query = db.query(*_SUPPLIER_PRODUCT_LIST_COLUMNS)
     
     # Filter out archived records by default
     if not include_archived:
         query = query.filter(SupplierProduct.archived_at.is_(None))
-        
-    supplier_products = query.offset(skip).limit(limit).all()
     
-    # Convert to the same format as other endpoints
-    data = [
-        {
-            "id": sp.id,
-            "supplier_id": sp.supplier_id,
-            "product_id": sp.product_id,
-            "supplier_sku": sp.supplier_sku,
-            "cost": float(sp.cost) if sp.cost is not None else None,
-            "stock": sp.stock,
-            "lead_time_days": sp.lead_time_days,
-            "is_active": sp.is_active,
-            "notes": sp.notes,
-            "archived_at": sp.archived_at,
-            "created_at": sp.created_at,
-            "last_updated": sp.last_updated,
-        }
-        for sp in supplier_products
-    ]
-    return data
+    # Keyset on id: the body stays a plain list, so the next cursor goes in a header
+    if cursor:
+        try:
+            (after_id,) = decode_cursor(cursor, 1)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(SupplierProduct.id > after_id)
+    else:
+        query = query.offset(skip)
+    
+    supplier_products = query.order_by(SupplierProduct.id).limit(limit + 1).all()
+    headers = {}
+    if len(supplier_products) > limit:
+        supplier_products = supplier_products[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(supplier_products[-1].id)
+    
+    # Convert to the same format as other endpoints (orjson_default turns cost into a float)
+    data = [dict(zip(_SUPPLIER_PRODUCT_LIST_FIELDS, row)) for row in supplier_products]
+    return FastORJSONResponse(data, headers=headers)
 
-@router.get("/{product_id}/supplier-products", response_model=List[SupplierProductResponse])
+@router.get("/{product_id}/supplier-products", responses={200: {"model": List[SupplierProductResponse]}})
 def get_supplier_products_by_product(product_id: int, include_archived: bool = False, db: Session = Depends(get_db)):
     """Get all supplier-product relationships for a specific product"""
-    # Verify product exists
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    query = db.query(SupplierProduct).filter(SupplierProduct.product_id == product_id)
+    # Verify product exists and load its supplier products in the same round trip
+    supplier_products = Product.supplier_products
     
     # Filter out archived records by default
     if not include_archived:
-        query = query.filter(SupplierProduct.archived_at.is_(None))
-        
-    supplier_products = query.all()
-    return supplier_products
+        supplier_products = supplier_products.and_(SupplierProduct.archived_at.is_(None))
+    
+    product = db.query(Product).options(
+        load_only(Product.id),
+        joinedload(supplier_products)
+    ).filter(Product.id == product_id).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return [_serialize_supplier_product(sp) for sp in product.supplier_products]
 
-@router.get("/supplier-product/{supplier_product_id}", response_model=SupplierProductResponse)
+@router.get("/supplier-product/{supplier_product_id}", responses={200: {"model": SupplierProductResponse}})
 def get_supplier_product(supplier_product_id: int, include_archived: bool = False, db: Session = Depends(get_db), user: dict = Depends(verify_google_token)):
-    query = db.query(SupplierProduct).filter(SupplierProduct.id == supplier_product_id)
+    # lambda_stmt caches the built statement; only the response columns are selected
+    stmt = lambda_stmt(lambda: select(*_SUPPLIER_PRODUCT_COLUMNS).where(SupplierProduct.id == supplier_product_id))
     
     # Filter out archived records by default
     if not include_archived:
-        query = query.filter(SupplierProduct.archived_at.is_(None))
+        stmt += lambda s: s.where(SupplierProduct.archived_at.is_(None))
         
-    supplier_product = query.first()
+    supplier_product = db.execute(stmt).first()
     if supplier_product is None:
         raise HTTPException(status_code=404, detail="Supplier Product not found")
-    return supplier_product
+    return _serialize_supplier_product(supplier_product)
 
-@router.put("/supplier-product/{supplier_product_id}", response_model=SupplierProductResponse)
+@router.put("/supplier-product/{supplier_product_id}", responses={200: {"model": SupplierProductResponse}})
 def update_supplier_product(
     supplier_product_id: int,
     supplier_product: SupplierProductUpdate,
     db: Session = Depends(get_db),
     user: dict = Depends(verify_google_token)
 ):
-    db_supplier_product = db.query(SupplierProduct).filter(SupplierProduct.id == supplier_product_id).first()
-    if db_supplier_product is None:
+    row = _update_returning(
+        db, SupplierProduct, supplier_product_id,
+        supplier_product.model_dump(exclude_unset=True), _SUPPLIER_PRODUCT_COLUMNS
+    )
+    if row is None:
         raise HTTPException(status_code=404, detail="Supplier Product not found")
-    
-    for key, value in supplier_product.model_dump(exclude_unset=True).items():
-        setattr(db_supplier_product, key, value)
-    
-    db.commit()
-    db.refresh(db_supplier_product)
-    return db_supplier_product
+    return FastORJSONResponse(_serialize_supplier_product(row))
 
 # Update shipping info for supplier product (from balance page)
-@router.patch("/supplier-product/{supplier_product_id}/shipping", response_model=SupplierProductResponse)
+@router.patch("/supplier-product/{supplier_product_id}/shipping", responses={200: {"model": SupplierProductResponse}})
 def update_supplier_product_shipping(
     supplier_product_id: int,
     shipping_data: dict,
@@ -808,46 +1089,41 @@ def update_supplier_product_shipping(
     user: dict = Depends(verify_google_token)
 ):
     """Update shipping method and costs for a supplier product"""
-    db_supplier_product = db.query(SupplierProduct).filter(SupplierProduct.id == supplier_product_id).first()
-    if db_supplier_product is None:
-        raise HTTPException(status_code=404, detail="Supplier Product not found")
+    changes = {}
     
     # Update shipping method
     if 'shipping_method' in shipping_data:
-        db_supplier_product.shipping_method = shipping_data['shipping_method']
+        changes['shipping_method'] = shipping_data['shipping_method']
     
     # Update shipping costs based on method
     if shipping_data.get('shipping_method') == 'DIRECT':
         if 'shipping_cost_direct' in shipping_data:
-            db_supplier_product.shipping_cost_direct = shipping_data['shipping_cost_direct']
+            changes['shipping_cost_direct'] = shipping_data['shipping_cost_direct']
         # Reset stage costs when switching to DIRECT
-        db_supplier_product.shipping_stage1_cost = 0.0
-        db_supplier_product.shipping_stage2_cost = 0.0
-        db_supplier_product.shipping_stage3_cost = 0.0
-        db_supplier_product.shipping_stage4_cost = 0.0
+        changes['shipping_stage1_cost'] = 0.0
+        changes['shipping_stage2_cost'] = 0.0
+        changes['shipping_stage3_cost'] = 0.0
+        changes['shipping_stage4_cost'] = 0.0
     elif shipping_data.get('shipping_method') == 'OCURRE':
         # Update stage costs
-        if 'shipping_stage1_cost' in shipping_data:
-            db_supplier_product.shipping_stage1_cost = shipping_data['shipping_stage1_cost']
-        if 'shipping_stage2_cost' in shipping_data:
-            db_supplier_product.shipping_stage2_cost = shipping_data['shipping_stage2_cost']
-        if 'shipping_stage3_cost' in shipping_data:
-            db_supplier_product.shipping_stage3_cost = shipping_data['shipping_stage3_cost']
-        if 'shipping_stage4_cost' in shipping_data:
-            db_supplier_product.shipping_stage4_cost = shipping_data['shipping_stage4_cost']
+        for key in ('shipping_stage1_cost', 'shipping_stage2_cost', 'shipping_stage3_cost', 'shipping_stage4_cost'):
+            if key in shipping_data:
+                changes[key] = shipping_data[key]
         # Reset direct cost when switching to OCURRE
-        db_supplier_product.shipping_cost_direct = 0.0
+        changes['shipping_cost_direct'] = 0.0
     
     # Update shipping notes if provided
     if 'shipping_notes' in shipping_data:
-        db_supplier_product.shipping_notes = shipping_data['shipping_notes']
+        changes['shipping_notes'] = shipping_data['shipping_notes']
     
-    db.commit()
-    db.refresh(db_supplier_product)
-    return db_supplier_product
+    # One UPDATE ... RETURNING instead of SELECT, flush and refresh
+    row = _update_returning(db, SupplierProduct, supplier_product_id, changes, _SUPPLIER_PRODUCT_COLUMNS)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Supplier Product not found")
+    return FastORJSONResponse(_serialize_supplier_product(row))
 
 # Get supplier product by supplier_id and product_id
-@router.get("/supplier-product/by-relationship/{supplier_id}/{product_id}", response_model=SupplierProductResponse)
+@router.get("/supplier-product/by-relationship/{supplier_id}/{product_id}", responses={200: {"model": SupplierProductResponse}})
 def get_supplier_product_by_relationship(
     supplier_id: int,
     product_id: int,
@@ -855,75 +1131,95 @@ def get_supplier_product_by_relationship(
     user: dict = Depends(verify_google_token)
 ):
     """Get supplier product by supplier_id and product_id"""
-    supplier_product = db.query(SupplierProduct).filter(
+    supplier_product = db.execute(lambda_stmt(lambda: select(*_SUPPLIER_PRODUCT_COLUMNS).where(
         SupplierProduct.supplier_id == supplier_id,
         SupplierProduct.product_id == product_id,
         SupplierProduct.archived_at.is_(None)
-    ).first()
+    ))).first()
     
     if supplier_product is None:
         raise HTTPException(status_code=404, detail="Supplier Product relationship not found")
     
-    return supplier_product
+    return _serialize_supplier_product(supplier_product)
 
 # Archive/Unarchive endpoints for Products
 # DEPRECATED: This endpoint archives records in the old Product table. New implementations should use PATCH /supplier-products/{id}/archive
 # Kept for backward compatibility with existing production app
+def _set_archived_at(db: Session, model, row_id: int, archived_at):
+    """Set archived_at on one row in a single UPDATE ... RETURNING; None if the row doesn't exist."""
+    return _update_returning(db, model, row_id, {"archived_at": archived_at}, (model.archived_at,))
+
 @router.patch("/{product_id}/archive")
 def archive_product(product_id: int, db: Session = Depends(get_db), user: dict = Depends(verify_google_token)):
     """Archive a product (soft delete) - DEPRECATED"""
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    if db_product is None:
+    row = _set_archived_at(db, Product, product_id, func.now())
+    if row is None:
         return {"success": False, "data": None, "error": "Product not found", "message": None}
     
-    db_product.archived_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_product)
-    
-    return {"success": True, "data": {"id": product_id, "archived_at": db_product.archived_at}, "error": None, "message": "Product archived successfully"}
+    return {"success": True, "data": {"id": product_id, "archived_at": row.archived_at}, "error": None, "message": "Product archived successfully"}
 
 # DEPRECATED: This endpoint unarchives records in the old Product table. New implementations should use PATCH /supplier-products/{id}/unarchive
 # Kept for backward compatibility with existing production app
 @router.patch("/{product_id}/unarchive")
 def unarchive_product(product_id: int, db: Session = Depends(get_db), user: dict = Depends(verify_google_token)):
     """Unarchive a product (restore from soft delete) - DEPRECATED"""
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    if db_product is None:
+    row = _set_archived_at(db, Product, product_id, None)
+    if row is None:
         return {"success": False, "data": None, "error": "Product not found", "message": None}
     
-    db_product.archived_at = None
-    db.commit()
-    db.refresh(db_product)
-    
     return {"success": True, "data": {"id": product_id, "archived_at": None}, "error": None, "message": "Product restored successfully"}
 
 # Archive/Unarchive endpoints for SupplierProducts
 @router.patch("/supplier-product/{supplier_product_id}/archive")
 def archive_supplier_product(supplier_product_id: int, db: Session = Depends(get_db), user: dict = Depends(verify_google_token)):
     """Archive a supplier-product relationship (soft delete)"""
-    db_supplier_product = db.query(SupplierProduct).filter(SupplierProduct.id == supplier_product_id).first()
-    if db_supplier_product is None:
+    row = _set_archived_at(db, SupplierProduct, supplier_product_id, func.now())
+    if row is None:
         raise HTTPException(status_code=404, detail="Supplier Product not found")
     
-    db_supplier_product.archived_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_supplier_product)
-    
-    return {"success": True, "data": {"id": supplier_product_id, "archived_at": db_supplier_product.archived_at}, "error": None, "message": "Supplier Product archived successfully"}
+    return {"success": True, "data": {"id": supplier_product_id, "archived_at": row.archived_at}, "error": None, "message": "Supplier Product archived successfully"}
 
 @router.patch("/supplier-product/{supplier_product_id}/unarchive")
 def unarchive_supplier_product(supplier_product_id: int, db: Session = Depends(get_db), user: dict = Depends(verify_google_token)):
     """Unarchive a supplier-product relationship (restore from soft delete)"""
-    db_supplier_product = db.query(SupplierProduct).filter(SupplierProduct.id == supplier_product_id).first()
-    if db_supplier_product is None:
+    row = _set_archived_at(db, SupplierProduct, supplier_product_id, None)
+    if row is None:
         raise HTTPException(status_code=404, detail="Supplier Product not found")
     
-    db_supplier_product.archived_at = None
-    db.commit()
-    db.refresh(db_supplier_product)
-    
     return {"success": True, "data": {"id": supplier_product_id, "archived_at": None}, "error": None, "message": "Supplier Product restored successfully"}
 
+class BulkArchiveRequest(BaseModel):
+    ids: List[int]
+    archive: bool
+
+@router.patch("/supplier-product/bulk-archive")
+def bulk_archive_supplier_products(request: BulkArchiveRequest, db: Session = Depends(get_db), user: dict = Depends(verify_google_token)):
+    """Archive (archive=true) or restore (archive=false) many supplier products with one UPDATE"""
+    updated_ids = []
+    archived_at = None
+    if request.ids:
+        rows = db.execute(
+            update(SupplierProduct)
+            .where(SupplierProduct.id.in_(request.ids))
+            .values(archived_at=func.now() if request.archive else None)
+            .returning(SupplierProduct.id, SupplierProduct.archived_at)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+        _product_cache.clear()
+        updated_ids = [row.id for row in rows]
+        if rows:
+            # now() is the transaction start time, so every row got the same value
+            archived_at = rows[0].archived_at
+
+    action = "archived" if request.archive else "restored"
+    return {
+        "success": True,
+        "data": {"ids": updated_ids, "updated_count": len(updated_ids), "archived_at": archived_at},
+        "error": None,
+        "message": f"{len(updated_ids)} Supplier Products {action} successfully"
+    }
+
 # Stock Management Endpoints
 
 class StockUpdateItem(BaseModel):
@@ -954,73 +1250,36 @@ def update_product_stock(
     user: dict = Depends(verify_google_token)
 ):
     """Update stock level for a supplier product (product_id is now supplier_product.id)"""
-    # Query SupplierProduct instead of Product
-    db_supplier_product = db.query(SupplierProduct).filter(SupplierProduct.id == product_id).first()
-    if db_supplier_product is None:
-        return {"success": False, "data": None, "error": "Supplier product not found", "message": None}
-    
-    db_supplier_product.stock = stock
+    changes = {"stock": stock, "last_updated": func.now()}
     if price is not None:
-        db_supplier_product.cost = price  # Update cost instead of price
-    db_supplier_product.last_updated = datetime.utcnow()
-    
-    db.commit()
-    db.refresh(db_supplier_product)
-    
-    total_value = None
-    if db_supplier_product.stock and db_supplier_product.cost:
-        total_value = float(db_supplier_product.stock * db_supplier_product.cost)
+        changes["cost"] = price  # Update cost instead of price
+    row = _update_returning(db, SupplierProduct, product_id, changes, _STOCK_ITEM_COLUMNS)
+    if row is None:
+        return {"success": False, "data": None, "error": "Supplier product not found", "message": None}
     
     return {
         "success": True,
-        "data": {
-            "id": db_supplier_product.id,
-            "name": db_supplier_product.name,
-            "sku": db_supplier_product.sku,
-            "stock": db_supplier_product.stock,
-            "price": float(db_supplier_product.cost) if db_supplier_product.cost else None,
-            "total_value": total_value,
-            "last_updated": db_supplier_product.last_updated
-        },
+        "data": _serialize_stock_item(row),
         "error": None,
         "message": "Stock updated successfully"
     }
 
-@router.post("/stock/bulk-update")
-def bulk_update_stock(
-    bulk_update: BulkStockUpdate,
-    db: Session = Depends(get_db),
-    user: dict = Depends(verify_google_token)
-):
-    """Update stock levels for multiple supplier products"""
-    updated_products = []
-    errors = []
-    
-    for update_item in bulk_update.updates:
-        try:
-            # Query SupplierProduct instead of Product
-            db_supplier_product = db.query(SupplierProduct).filter(SupplierProduct.id == update_item.product_id).first()
-            if db_supplier_product is None:
-                errors.append(f"Supplier product with ID {update_item.product_id} not found")
-                continue
-            
-            db_supplier_product.stock = update_item.stock
-            if update_item.price is not None:
-                db_supplier_product.cost = update_item.price  # Update cost instead of price
-            db_supplier_product.last_updated = datetime.utcnow()
-            
-            updated_products.append({
-                "id": db_supplier_product.id,
-                "name": db_supplier_product.name,
-                "sku": db_supplier_product.sku,
-                "stock": db_supplier_product.stock,
-                "price": float(db_supplier_product.cost) if db_supplier_product.cost else None
-            })
-        except Exception as e:
-            errors.append(f"Error updating supplier product {update_item.product_id}: {str(e)}")
-    
-    db.commit()
-    
+# Bulk stock updates above this size are COPYed into a temp table and applied with UPDATE ... FROM
+COPY_THRESHOLD = 500
+
+def _merge_stock_updates(updates: List[StockUpdateItem]) -> dict:
+    """
+    Collapse repeated ids into one (stock, price) per id, in first-seen order, as if the
+    updates were applied in order: the last stock and the last non-null price win.
+    """
+    merged = {}
+    for u in updates:
+        previous = merged.get(u.product_id)
+        price = u.price if u.price is not None or previous is None else previous[1]
+        merged[u.product_id] = (u.stock, price)
+    return merged
+
+def _bulk_stock_response(updated_products: list, errors: list) -> dict:
     return {
         "success": len(errors) == 0,
         "data": {
@@ -1031,3 +1290,87 @@ def bulk_update_stock(
         "error": None if len(errors) == 0 else "Some updates failed",
         "message": f"Updated {len(updated_products)} supplier products successfully"
     }
+
+def _bulk_update_stock_copy(db: Session, merged: dict) -> dict:
+    """Apply a large stock batch with COPY into a temp table and one UPDATE ... FROM ... RETURNING."""
+    buf = io.StringIO()
+    for sp_id, (stock, price) in merged.items():
+        buf.write(f"{sp_id}\t{stock}\t{'' if price is None else price}\n")
+    buf.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.execute("CREATE TEMP TABLE tmp_stock (id integer, stock integer, price numeric) ON COMMIT DROP")
+        cursor.copy_from(buf, "tmp_stock", columns=("id", "stock", "price"), sep="\t", null="")
+        cursor.execute(
+            "UPDATE supplier_product AS sp"
+            " SET stock = t.stock, cost = COALESCE(t.price, sp.cost), last_updated = now()"
+            " FROM tmp_stock AS t WHERE sp.id = t.id"
+            " RETURNING sp.id, sp.name, sp.sku, sp.stock, sp.cost, sp.last_updated"
+        )
+        returned = {row[0]: row for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+    db.commit()
+    _product_cache.clear()
+
+    updated_products = [_serialize_stock_item(_StockItemRow(*returned[sp_id])) for sp_id in merged if sp_id in returned]
+    errors = [f"Supplier product with ID {sp_id} not found" for sp_id in merged if sp_id not in returned]
+    return _bulk_stock_response(updated_products, errors)
+
+_sp_table = SupplierProduct.__table__
+_BULK_STOCK_UPDATE = (
+    update(_sp_table)
+    .where(_sp_table.c.id == bindparam("_id"))
+    .values(
+        stock=bindparam("_stock"),
+        cost=func.coalesce(bindparam("_cost", type_=_sp_table.c.cost.type), _sp_table.c.cost),
+        last_updated=bindparam("_last_updated"),
+    )
+)
+
+@router.post("/stock/bulk-update")
+def bulk_update_stock(
+    bulk_update: BulkStockUpdate,
+    db: Session = Depends(get_db),
+    user: dict = Depends(verify_google_token)
+):
+    """
+    Update stock levels for multiple supplier products.
+
+    Repeated ids are merged (last stock, last non-null price) and reported once, whichever path runs.
+    """
+    merged = _merge_stock_updates(bulk_update.updates)
+    if len(merged) > COPY_THRESHOLD:
+        return _bulk_update_stock_copy(db, merged)
+
+    # One SELECT validates every id and supplies the columns the response needs
+    existing = {
+        row.id: row
+        for row in db.query(
+            SupplierProduct.id, SupplierProduct.name, SupplierProduct.sku, SupplierProduct.cost
+        ).filter(SupplierProduct.id.in_(merged.keys()))
+    }
+    now = datetime.now(timezone.utc)
+    mappings = []
+    updated_products = []
+    errors = []
+
+    for sp_id, (stock, price) in merged.items():
+        row = existing.get(sp_id)
+        if row is None:
+            errors.append(f"Supplier product with ID {sp_id} not found")
+            continue
+
+        mappings.append({"_id": sp_id, "_stock": stock, "_cost": price, "_last_updated": now})
+        updated_products.append(_serialize_stock_item(
+            _StockItemRow(sp_id, row.name, row.sku, stock, row.cost if price is None else price, now)  # Price updates cost
+        ))
+
+    if mappings:
+        # One executemany keyed on bindparams (SQLAlchemy 1.4-compatible; a NULL price keeps the cost)
+        db.execute(_BULK_STOCK_UPDATE, mappings)
+    db.commit()
+    _product_cache.clear()
+    
+    return _bulk_stock_response(updated_products, errors)
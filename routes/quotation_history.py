@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import tuple_, update, insert
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import List, Optional, Union
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 from datetime import datetime
 from models import get_db, Quotation
 from auth import verify_google_token
+from utils.pagination import encode_cursor, decode_cursor, decode_datetime
+from utils.responses import FastORJSONResponse
+from utils.ttl_cache import TTLCache
 
-router = APIRouter(prefix="/quotation-history", tags=["quotation-history"])
+router = APIRouter(prefix="/quotation-history", tags=["quotation-history"], default_response_class=FastORJSONResponse)
 
 class QuotationCreate(BaseModel):
     user_query: str
@@ -34,11 +38,37 @@ class QuotationResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+class QuotationListItem(BaseModel):
+    """Listing row without the markdown/raw-response TEXT columns."""
+    id: int
+    user_id: str
+    user_email: str
+    title: Optional[str]
+    customer_name: Optional[str]
+    customer_location: Optional[str]
+    quotation_id: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+_quotation_adapter = TypeAdapter(QuotationResponse)
+# QuotationResponse columns: reads and INSERT ... RETURNING fetch plain rows, never ORM instances
+_QUOTATION_COLUMNS = tuple(getattr(Quotation, f) for f in QuotationResponse.model_fields)
+_quotation_list_adapter = TypeAdapter(List[QuotationResponse])
+_quotation_summary_list_adapter = TypeAdapter(List[QuotationListItem])
+# Columns selected for summary=true listings; the TEXT blobs are never read
+_QUOTATION_LIST_COLUMNS = tuple(getattr(Quotation, f) for f in QuotationListItem.model_fields)
+
+# Worker-local cache of encoded GET responses, keyed by ("list", skip, limit, cursor, summary) or ("detail", id).
+# The history is shared by all users, so entries are too. Creating or archiving a quotation
+# clears the whole cache; other workers catch up within the TTL.
+_quotation_cache = TTLCache(maxsize=256, ttl=30)
 
 @router.post("/", response_model=QuotationResponse)
-async def create_quotation(
+def create_quotation(
     quotation: QuotationCreate,
     db: Session = Depends(get_db),
     user: dict = Depends(verify_google_token)
@@ -46,49 +76,70 @@ async def create_quotation(
     """
     Save a generated quotation (both internal and customer-facing versions).
     """
-    # Generate title from query if not provided
-    title = quotation.title
-    if not title:
-        # Use first 50 characters of query as title
-        title = quotation.user_query[:50] + ("..." if len(quotation.user_query) > 50 else "")
-    
-    db_quotation = Quotation(
-        user_id=user["user_id"],
-        user_email=user["email"],
-        user_query=quotation.user_query,
-        title=title,
-        customer_name=quotation.customer_name,
-        customer_location=quotation.customer_location,
-        quotation_id=quotation.quotation_id,
-        internal_quotation=quotation.internal_quotation,
-        customer_quotation=quotation.customer_quotation,
-        raw_response=quotation.raw_response
-    )
-    
-    db.add(db_quotation)
+    data = quotation.model_dump(exclude_none=True)
+    if not data.get("title"):
+        # Left unset, the quotation_default_title trigger derives it from user_query
+        data.pop("title", None)
+    # INSERT ... RETURNING hands back the server-set id, timestamps and trigger title, no refresh SELECT
+    row = db.execute(
+        insert(Quotation)
+        .values(user_id=user["user_id"], user_email=user["email"], **data)
+        .returning(*_QUOTATION_COLUMNS)
+    ).first()
     db.commit()
-    db.refresh(db_quotation)
+    _quotation_cache.clear()
     
-    return db_quotation
+    return Response(_quotation_adapter.dump_json(_quotation_adapter.validate_python(row, from_attributes=True)), media_type="application/json")
 
-@router.get("/", response_model=List[QuotationResponse])
-async def get_quotations(
-    skip: int = 0,
+@router.get("/", response_model=Union[List[QuotationResponse], List[QuotationListItem]])
+def get_quotations(
+    skip: int = Query(0, description="Deprecated: prefer `cursor`"),
     limit: int = 50,
+    cursor: Optional[str] = Query(None, description="Keyset cursor (X-Next-Cursor header of the previous page)"),
+    summary: bool = Query(False, description="Return QuotationListItem rows, without the quotation texts"),
     db: Session = Depends(get_db),
     user: dict = Depends(verify_google_token)
 ):
     """
     Get all non-archived quotations from all users, ordered by most recent.
     """
-    quotations = db.query(Quotation).filter(
-        Quotation.archived_at == None
-    ).order_by(Quotation.created_at.desc()).offset(skip).limit(limit).all()
+    cache_key = ("list", skip, limit, cursor, summary)
+    cached = _quotation_cache.get(cache_key)
+    if cached is None:
+        if summary:
+            query = db.query(*_QUOTATION_LIST_COLUMNS)
+            adapter = _quotation_summary_list_adapter
+        else:
+            query = db.query(*_QUOTATION_COLUMNS)
+            adapter = _quotation_list_adapter
+        query = query.filter(Quotation.archived_at == None)
+        # Keyset on (created_at, id): the body stays a plain list, so the next cursor goes in a header
+        if cursor:
+            try:
+                after_created_at, after_id = decode_cursor(cursor, 2)
+                after_created_at = decode_datetime(after_created_at)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            query = query.filter(tuple_(Quotation.created_at, Quotation.id) < tuple_(after_created_at, after_id))
+        else:
+            query = query.offset(skip)
+        
+        quotations = query.order_by(Quotation.created_at.desc(), Quotation.id.desc()).limit(limit + 1).all()
+        next_cursor = None
+        if len(quotations) > limit:
+            quotations = quotations[:limit]
+            next_cursor = encode_cursor(quotations[-1].created_at, quotations[-1].id)
+        # Encode once; cache hits return the bytes as-is
+        body = adapter.dump_json(adapter.validate_python(quotations, from_attributes=True))
+        cached = (body, next_cursor)
+        _quotation_cache.set(cache_key, cached)
     
-    return quotations
+    body, next_cursor = cached
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(body, media_type="application/json", headers=headers)
 
 @router.get("/{quotation_id}", response_model=QuotationResponse)
-async def get_quotation(
+def get_quotation(
     quotation_id: int,
     db: Session = Depends(get_db),
     user: dict = Depends(verify_google_token)
@@ -97,18 +148,24 @@ async def get_quotation(
     Get a specific quotation by ID (accessible by all authenticated users).
     Excludes archived quotations.
     """
-    quotation = db.query(Quotation).filter(
-        Quotation.id == quotation_id,
-        Quotation.archived_at == None
-    ).first()
+    cache_key = ("detail", quotation_id)
+    body = _quotation_cache.get(cache_key)
+    if body is None:
+        quotation = db.query(*_QUOTATION_COLUMNS).filter(
+            Quotation.id == quotation_id,
+            Quotation.archived_at == None
+        ).first()
+        
+        if not quotation:
+            raise HTTPException(status_code=404, detail="Quotation not found")
+        
+        body = _quotation_adapter.dump_json(_quotation_adapter.validate_python(quotation, from_attributes=True))
+        _quotation_cache.set(cache_key, body)
     
-    if not quotation:
-        raise HTTPException(status_code=404, detail="Quotation not found")
-    
-    return quotation
+    return Response(body, media_type="application/json")
 
 @router.delete("/{quotation_id}")
-async def delete_quotation(
+def delete_quotation(
     quotation_id: int,
     db: Session = Depends(get_db),
     user: dict = Depends(verify_google_token)
@@ -116,18 +173,20 @@ async def delete_quotation(
     """
     Archive a quotation (soft delete) - accessible by all authenticated users.
     """
-    quotation = db.query(Quotation).filter(
-        Quotation.id == quotation_id,
-        Quotation.archived_at == None
-    ).first()
+    # Soft delete: set archived_at in one UPDATE ... RETURNING, without loading the quotation texts
+    archived_id = db.execute(
+        update(Quotation)
+        .where(Quotation.id == quotation_id, Quotation.archived_at == None)
+        .values(archived_at=func.now())
+        .returning(Quotation.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
     
-    if not quotation:
+    if archived_id is None:
         raise HTTPException(status_code=404, detail="Quotation not found")
     
-    # Soft delete: set archived_at timestamp
-    quotation.archived_at = func.now()
     db.commit()
-    db.refresh(quotation)
+    _quotation_cache.clear()
     
     return {"message": "Quotation archived successfully"}
 
@@ -1,17 +1,75 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, exists, or_, func
 from typing import Optional, List
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
+import multiprocessing
+import logging
 import tempfile
 import os
-import glob
-from models import get_db, Supplier, SupplierProduct
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+import orjson
+from models import get_db, SessionLocal, Supplier, SupplierProduct, MessageBatchJob
 from quotation_processor import QuotationProcessor
+from utils.pdf_text import extract_pdf_text
 from config import claude_api_key
 from auth import verify_google_token
+from utils.responses import FastORJSONResponse, orjson_default
 
 router = APIRouter(prefix="/quotations", tags=["quotations"])
+logger = logging.getLogger(__name__)
+
+# Lowercase suffixes of the document types the processor accepts
+SUPPORTED_EXTENSIONS = frozenset({'.pdf', '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp', '.txt'})
+SUPPORTED_FORMATS = "PDF, PNG, JPG, JPEG, GIF, BMP, TIFF, WEBP, TXT"
+
+# Uploads are copied to disk this many bytes at a time
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Batch files are processed on this pool. The work is mostly waiting on the Claude API, so
+# threads suffice; the small size keeps API rate limits and memory in check.
+BATCH_MAX_WORKERS = 4
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix="quotation-batch")
+
+# Batch PDFs are parsed on a process pool: PyMuPDF extraction is CPU-bound and holds the GIL,
+# so it scales with cores only across processes. Sized to the CPUs this process may run on
+# (not the host's), capped because each worker is a full interpreter. Workers come from a
+# forkserver, never a fork of this threaded process (held locks, pooled DB connections);
+# they only import utils.pdf_text.
+PARSE_MAX_WORKERS = min(len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1), 4)
+_parse_executor: Optional[ProcessPoolExecutor] = None
+
+def _get_parse_executor() -> ProcessPoolExecutor:
+    """Create the parse pool on first use (only ever called from the event loop thread)."""
+    global _parse_executor
+    if _parse_executor is None:
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        mp_context = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            mp_context.set_forkserver_preload(["utils.pdf_text"])
+        _parse_executor = ProcessPoolExecutor(max_workers=PARSE_MAX_WORKERS, mp_context=mp_context)
+    return _parse_executor
+
+def shutdown_parse_executor() -> None:
+    """Stop the parse pool's worker processes; called from the app's shutdown hook."""
+    global _parse_executor
+    if _parse_executor is not None:
+        _parse_executor.shutdown(wait=True, cancel_futures=True)
+        _parse_executor = None
+
+@lru_cache(maxsize=1)
+def get_processor() -> QuotationProcessor:
+    """
+    Shared QuotationProcessor for every request.
+
+    It holds only the Anthropic client and the SKU rules, both safe to share across
+    threads, and each process_quotation call opens its own DB session.
+    """
+    return QuotationProcessor(claude_api_key)
 
 class SupplierDetectionInfo(BaseModel):
     confidence: str  # "high", "medium", "low", "none"
@@ -49,12 +107,12 @@ class BatchQuotationResponse(BaseModel):
     errors: List[dict]
 
 @router.post("/process", response_model=QuotationResponse)
-@router.post("process", response_model=QuotationResponse)  # Handle both /quotations/process and /quotations/process/ explicitly  
 async def process_quotation(
     file: UploadFile = File(...),
     category_id: Optional[int] = Form(None),
     db: Session = Depends(get_db),
-    user: dict = Depends(verify_google_token)
+    user: dict = Depends(verify_google_token),
+    processor: QuotationProcessor = Depends(get_processor)
 ):
     """
     Process a document with product information and extract structured data.
@@ -81,28 +139,22 @@ async def process_quotation(
     are processed directly as text with specialized parsing for informal product discussions.
     """
     # Check if file format is supported
-    supported_extensions = {'.pdf', '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp', '.txt'}
-    file_extension = os.path.splitext(file.filename.lower())[1]
-    if file_extension not in supported_extensions:
-        supported_formats = "PDF, PNG, JPG, JPEG, GIF, BMP, TIFF, WEBP, TXT"
-        raise HTTPException(status_code=400, detail=f"Unsupported file format. Supported formats: {supported_formats}")
+    file_extension = os.path.splitext(file.filename)[1].lower()
+    if file_extension not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported file format. Supported formats: {SUPPORTED_FORMATS}")
     
-    # Create a temporary file to store the uploaded file
-    file_extension = os.path.splitext(file.filename.lower())[1]
+    # Copy the upload to a temporary file in chunks, so a large scan is never held in memory whole
     with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-        content = await file.read()
-        temp_file.write(content)
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            temp_file.write(chunk)
         temp_file_path = temp_file.name
     
     try:
         print(f"🔍 API: Starting quotation processing for file: {file.filename}")
-        # Initialize the quotation processor
-        processor = QuotationProcessor(claude_api_key)
-        print("🔍 API: QuotationProcessor initialized")
         
-        # Process the quotation
+        # Process the quotation on a worker thread so the event loop keeps serving requests
         print("🔍 API: Calling process_quotation...")
-        results = processor.process_quotation(temp_file_path, category_id)
+        results = await asyncio.to_thread(processor.process_quotation, temp_file_path, category_id)
         print("🔍 API: process_quotation completed successfully")
         
         return results
@@ -115,17 +167,201 @@ async def process_quotation(
         raise HTTPException(status_code=500, detail=str(e))
         
     finally:
-        # Clean up the temporary file
-        if os.path.exists(temp_file_path):
+        # Clean up the temporary file; unlink directly instead of checking os.path.exists first
+        try:
             os.unlink(temp_file_path)
+        except FileNotFoundError:
+            pass
+
+def _list_batch_files(folder_path: str) -> List[str]:
+    """Supported files in `folder_path`, sorted; raises 400 for a missing folder or no files."""
+    # Validate folder path exists
+    if not os.path.exists(folder_path):
+        raise HTTPException(status_code=400, detail=f"Directory not found: {folder_path}")
+
+    if not os.path.isdir(folder_path):
+        raise HTTPException(status_code=400, detail=f"Path is not a directory: {folder_path}")
+
+    # Find all supported files in the directory (case-insensitive) in one directory pass
+    with os.scandir(folder_path) as entries:
+        all_files = sorted(
+            entry.path for entry in entries
+            if os.path.splitext(entry.name)[1].lower() in SUPPORTED_EXTENSIONS and entry.is_file()
+        )
+
+    if not all_files:
+        raise HTTPException(status_code=400, detail=f"No supported files found in directory: {folder_path}. Supported formats: {SUPPORTED_FORMATS}")
+    return all_files
+
+# A poll saving a message batch's results claims its MessageBatchJob row; a claim older than
+# this is taken to belong to a worker that died mid-save and can be taken over
+MESSAGE_BATCH_CLAIM_TIMEOUT = timedelta(minutes=30)
+
+async def _extract_batch_text(processor: QuotationProcessor, file_path: str) -> str:
+    """Text of one batch file: PDFs are parsed on the process pool, images/TXT on the batch pool."""
+    loop = asyncio.get_running_loop()
+    if processor.is_pdf_file(file_path):
+        return await loop.run_in_executor(_get_parse_executor(), extract_pdf_text, file_path)
+    return await loop.run_in_executor(_batch_executor, processor.extract_text, file_path)
+
+async def _process_batch_file(processor: QuotationProcessor, file_path: str, category_id: Optional[int]) -> dict:
+    """Extract one batch file's text, then run the Claude extraction and DB save on the batch pool."""
+    text = await _extract_batch_text(processor, file_path)
+    return await asyncio.get_running_loop().run_in_executor(_batch_executor, processor.process_text, text, category_id)
+
+def _batch_error(file_path: str, error: Exception) -> dict:
+    return {"filename": os.path.basename(file_path), "file_path": file_path, "error": str(error)}
+
+def _finish_message_batch_entry(processor: QuotationProcessor, entry, text: str, params: dict, category_id: Optional[int]) -> dict:
+    """Parse one Message Batches result and save its products."""
+    if entry.result.type != "succeeded":
+        detail = getattr(entry.result, "error", None)
+        raise Exception(f"Message batch request {entry.result.type}" + (f": {detail}" if detail else ""))
+    structured_data = processor.parse_extraction_response(entry.result.message.content[0].text.strip(), text, params)
+    return processor.save_structured_data(structured_data, category_id)
+
+# MessageBatchJob helpers: each runs on a worker thread with its own short-lived session
+
+def _store_message_batch_job(job: MessageBatchJob) -> None:
+    session = SessionLocal()
+    try:
+        session.add(job)
+        session.commit()
+    finally:
+        session.close()
+
+def _message_batch_job_exists(batch_id: str) -> bool:
+    session = SessionLocal()
+    try:
+        return session.query(exists().where(MessageBatchJob.batch_id == batch_id)).scalar()
+    finally:
+        session.close()
+
+def _claim_message_batch_job(batch_id: str):
+    """Claim an unclaimed (or abandoned) job in one UPDATE ... RETURNING; None if another poll holds it."""
+    session = SessionLocal()
+    try:
+        job = session.execute(
+            update(MessageBatchJob)
+            .where(
+                MessageBatchJob.batch_id == batch_id,
+                or_(
+                    MessageBatchJob.claimed_at == None,
+                    MessageBatchJob.claimed_at < func.now() - MESSAGE_BATCH_CLAIM_TIMEOUT,
+                ),
+            )
+            .values(claimed_at=func.now())
+            .returning(MessageBatchJob.category_id, MessageBatchJob.total_files, MessageBatchJob.files, MessageBatchJob.errors)
+            .execution_options(synchronize_session=False)
+        ).first()
+        session.commit()
+        return job
+    finally:
+        session.close()
+
+def _release_message_batch_job(batch_id: str, files: dict) -> None:
+    """Give the claim back after a failed save, keeping only the files that were not saved."""
+    session = SessionLocal()
+    try:
+        session.execute(
+            update(MessageBatchJob)
+            .where(MessageBatchJob.batch_id == batch_id)
+            .values(claimed_at=None, files=files)
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+    finally:
+        session.close()
+
+def _delete_message_batch_job(batch_id: str) -> None:
+    session = SessionLocal()
+    try:
+        session.execute(delete(MessageBatchJob).where(MessageBatchJob.batch_id == batch_id).execution_options(synchronize_session=False))
+        session.commit()
+    finally:
+        session.close()
+
+async def _submit_message_batch(all_files: List[str], category_id: Optional[int], processor: QuotationProcessor) -> dict:
+    """
+    Extract every file's text and send all extraction requests as one Message Batches job.
+    Returns the batch id right away; GET /process-batch/message-batches/{batch_id} saves the results.
+    """
+    texts = await asyncio.gather(
+        *(_extract_batch_text(processor, file_path) for file_path in all_files),
+        return_exceptions=True,
+    )
+    categories = await asyncio.to_thread(processor.load_categories)
+    
+    errors = []
+    files = {}  # custom_id -> {file_path, text}
+    requests = []
+    for i, (file_path, text) in enumerate(zip(all_files, texts)):
+        if isinstance(text, Exception):
+            errors.append(_batch_error(file_path, text))
+            continue
+        custom_id = f"file-{i}"
+        files[custom_id] = {"file_path": file_path, "text": text}
+        requests.append({"custom_id": custom_id, "params": processor.build_extraction_params(text, categories)})
+    
+    if not requests:
+        return {"batch_id": None, "processing_status": None, "submitted_files": 0, "errors": errors}
+    
+    batch = await asyncio.to_thread(processor.client.messages.batches.create, requests=requests)
+    await asyncio.to_thread(_store_message_batch_job, MessageBatchJob(
+        batch_id=batch.id, category_id=category_id, total_files=len(all_files), files=files, errors=errors
+    ))
+    logger.info("Submitted message batch %s with %d requests", batch.id, len(requests))
+    return {"batch_id": batch.id, "processing_status": batch.processing_status, "submitted_files": len(requests), "errors": errors}
+
+async def _save_message_batch_results(batch_id: str, job, saved: set, processor: QuotationProcessor) -> dict:
+    """
+    Parse and save each file's result of an ended batch; files without a result are reported as errors.
+    The custom_id of every saved file is added to `saved`, so a failed run can be retried without them.
+    """
+    batches = processor.client.messages.batches
+    entries = await asyncio.to_thread(lambda: list(batches.results(batch_id)))
+    categories = await asyncio.to_thread(processor.load_categories)
+    files = job.files
+    
+    results = []
+    errors = list(job.errors)
+    answered = set()
+    for entry in entries:
+        info = files.get(entry.custom_id)
+        if info is None:
+            continue
+        answered.add(entry.custom_id)
+        # params are only needed for the parser's retry request
+        params = processor.build_extraction_params(info["text"], categories)
+        try:
+            results.append(await asyncio.to_thread(
+                _finish_message_batch_entry, processor, entry, info["text"], params, job.category_id
+            ))
+            saved.add(entry.custom_id)
+        except Exception as e:
+            errors.append(_batch_error(info["file_path"], e))
+    for custom_id, info in files.items():
+        if custom_id not in answered:
+            errors.append(_batch_error(info["file_path"], Exception("No result returned for this file by the message batch")))
+    
+    return {
+        "batch_id": batch_id,
+        "processing_status": "ended",
+        "total_files_processed": job.total_files,
+        "successful_files": len(results),
+        "failed_files": len(errors),
+        "results": results,
+        "errors": errors
+    }
 
 @router.post("/process-batch", response_model=BatchQuotationResponse)
-@router.post("process-batch", response_model=BatchQuotationResponse)  # Handle both /quotations/process-batch and /quotations/process-batch/ explicitly
 async def process_quotation_batch(
     folder_path: str = Form(...),
     category_id: Optional[int] = Form(None),
+    async_batch: bool = Form(False),
     db: Session = Depends(get_db),
-    user: dict = Depends(verify_google_token)
+    user: dict = Depends(verify_google_token),
+    processor: QuotationProcessor = Depends(get_processor)
 ):
     """
     Process all supported files in a directory and extract structured data.
@@ -134,37 +370,17 @@ async def process_quotation_batch(
         folder_path: Path to the directory containing supported files (PDF, images, TXT)
         category_id: Optional product category ID (if not provided, AI will auto-categorize)
         
+        async_batch: Send the extractions as one Message Batches job (half the Claude cost,
+            but results can take up to 24h). Returns {batch_id, processing_status, submitted_files,
+            errors} right away; poll GET /process-batch/message-batches/{batch_id} for the results
+        
     Supported formats: PDF, PNG, JPG, JPEG, GIF, BMP, TIFF, WEBP, TXT
     Note: This endpoint processes files in parallel for faster batch processing
     """
-    # Validate folder path exists
-    if not os.path.exists(folder_path):
-        raise HTTPException(status_code=400, detail=f"Directory not found: {folder_path}")
-    
-    if not os.path.isdir(folder_path):
-        raise HTTPException(status_code=400, detail=f"Path is not a directory: {folder_path}")
-    
-    # Find all supported files in the directory (case-insensitive)
-    supported_patterns = [
-        "*.pdf", "*.PDF",
-        "*.png", "*.PNG",
-        "*.jpg", "*.JPG", "*.jpeg", "*.JPEG",
-        "*.gif", "*.GIF",
-        "*.bmp", "*.BMP",
-        "*.tiff", "*.TIFF",
-        "*.webp", "*.WEBP",
-        "*.txt", "*.TXT"
-    ]
-    
-    all_files = []
-    for pattern in supported_patterns:
-        all_files.extend(glob.glob(os.path.join(folder_path, pattern)))
-    
-    if not all_files:
-        raise HTTPException(status_code=400, detail=f"No supported files found in directory: {folder_path}. Supported formats: PDF, PNG, JPG, JPEG, GIF, BMP, TIFF, WEBP, TXT")
-    
-    # Initialize the quotation processor
-    processor = QuotationProcessor(claude_api_key)
+    all_files = _list_batch_files(folder_path)
+    if async_batch:
+        # Not a BatchQuotationResponse: returned as-is, past response_model validation
+        return FastORJSONResponse(await _submit_message_batch(all_files, category_id, processor))
     
     batch_results = {
         "total_files_processed": len(all_files),
@@ -174,63 +390,119 @@ async def process_quotation_batch(
         "errors": []
     }
     
-    print(f"Processing {len(all_files)} files from directory: {folder_path}")
-    print("=" * 60)
-    
-    # Process each file
-    for i, file_path in enumerate(all_files, 1):
-        filename = os.path.basename(file_path)
-        print(f"\n[{i}/{len(all_files)}] Processing: {filename}")
-        print("-" * 40)
-        
-        try:
-            # Process the quotation
-            result = processor.process_quotation(file_path, category_id)
-            batch_results["results"].append(result)
-            batch_results["successful_files"] += 1
-            
-            print(f"✅ Successfully processed: {filename}")
-            print(f"   Supplier: {result['supplier']}")
-            print(f"   Products: {result['products_processed']}")
-            
-            # Display product names
-            if result.get('skus_generated'):
-                print(f"   Product names:")
-                for sku_info in result['skus_generated']:
-                    print(f"     • {sku_info['product_name']}")
-            
-        except Exception as e:
-            error_info = {
-                "filename": filename,
-                "file_path": file_path,
-                "error": str(e)
-            }
-            batch_results["errors"].append(error_info)
-            batch_results["failed_files"] += 1
-            
-            print(f"❌ Failed to process: {filename}")
-            print(f"   Error: {str(e)}")
+    logger.info("Processing %d files from directory: %s", len(all_files), folder_path)
     
-    print(f"\n" + "=" * 60)
-    print(f"Batch Processing Complete:")
-    print(f"   Total files: {batch_results['total_files_processed']}")
-    print(f"   Successful: {batch_results['successful_files']}")
-    print(f"   Failed: {batch_results['failed_files']}")
+    # Process the files concurrently (PDF parsing on the process pool, the rest on the batch pool);
+    # the DB saves are serialized inside save_structured_data so a new supplier is created once
+    outcomes = await asyncio.gather(
+        *(_process_batch_file(processor, file_path, category_id) for file_path in all_files),
+        return_exceptions=True,
+    )
     
-    # Show all processed products
-    if batch_results['successful_files'] > 0:
-        all_products = []
-        for result in batch_results['results']:
-            for sku_info in result.get('skus_generated', []):
-                all_products.append(sku_info['product_name'])
+    for file_path, outcome in zip(all_files, outcomes):
+        if isinstance(outcome, Exception):
+            batch_results["errors"].append(_batch_error(file_path, outcome))
+            batch_results["failed_files"] += 1
+            logger.warning("Failed to process %s: %s", file_path, outcome)
+            continue
         
-        if all_products:
-            print(f"   Products added to database:")
-            for product_name in all_products:
-                print(f"     • {product_name}")
+        batch_results["results"].append(outcome)
+        batch_results["successful_files"] += 1
+        logger.info(
+            "Processed %s: suppliers=%s products=%d",
+            file_path, ", ".join(outcome.get("suppliers", {})), outcome["products_processed"],
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            for sku_info in outcome.get("skus_generated", []):
+                logger.debug("  %s: %s", file_path, sku_info["product_name"])
+    
+    logger.info(
+        "Batch complete: %d files, %d successful, %d failed",
+        batch_results["total_files_processed"], batch_results["successful_files"], batch_results["failed_files"],
+    )
     
     return batch_results
 
+async def _stream_batch_ndjson(all_files: List[str], category_id: Optional[int], processor: QuotationProcessor):
+    """Yield one JSON line per file as it finishes, then a summary line with the counts."""
+    futures = {
+        asyncio.ensure_future(_process_batch_file(processor, file_path, category_id)): file_path
+        for file_path in all_files
+    }
+    successful = 0
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                file_path = futures[future]
+                line = {"filename": os.path.basename(file_path), "file_path": file_path}
+                if future.exception() is not None:
+                    line["error"] = str(future.exception())
+                else:
+                    line["result"] = future.result()
+                    successful += 1
+                yield orjson.dumps(line, default=orjson_default) + b"\n"
+    finally:
+        # Client gone (generator closed): cancel the files not started or still extracting, so no
+        # more Claude calls or saves are spent on them, and retrieve finished ones' exceptions.
+        # A file already inside process_text runs to the end on its worker thread.
+        for future in futures:
+            if not future.done():
+                future.cancel()
+            elif not future.cancelled():
+                future.exception()
+    yield orjson.dumps({"summary": {
+        "total_files_processed": len(all_files),
+        "successful_files": successful,
+        "failed_files": len(all_files) - successful,
+    }}) + b"\n"
+
+# Same batch as /process-batch, streamed as NDJSON: {filename, file_path, result|error} per file, then {summary}
+@router.post("/process-batch/stream")
+async def process_quotation_batch_stream(
+    folder_path: str = Form(...),
+    category_id: Optional[int] = Form(None),
+    user: dict = Depends(verify_google_token),
+    processor: QuotationProcessor = Depends(get_processor)
+):
+    all_files = _list_batch_files(folder_path)
+    return StreamingResponse(_stream_batch_ndjson(all_files, category_id, processor), media_type="application/x-ndjson")
+
+@router.get("/process-batch/message-batches/{batch_id}")
+async def get_message_batch_results(
+    batch_id: str,
+    user: dict = Depends(verify_google_token),
+    processor: QuotationProcessor = Depends(get_processor)
+):
+    """
+    Status of an async_batch job. Once it has ended, the first call parses and saves every
+    file's products and returns the same fields as /process-batch (plus batch_id); the
+    results are saved only once, so later calls get 404. While another call is saving
+    them this returns 409; if that save fails, the next call retries the unsaved files.
+    """
+    if not await asyncio.to_thread(_message_batch_job_exists, batch_id):
+        raise HTTPException(status_code=404, detail="Message batch not found or its results were already saved")
+    
+    batch = await asyncio.to_thread(processor.client.messages.batches.retrieve, batch_id)
+    if batch.processing_status != "ended":
+        return {"batch_id": batch.id, "processing_status": batch.processing_status}
+    
+    # Claim the job so concurrent polls can't save the same results twice
+    job = await asyncio.to_thread(_claim_message_batch_job, batch_id)
+    if job is None:
+        raise HTTPException(status_code=409, detail="Message batch results are already being saved")
+    saved = set()
+    try:
+        results = await _save_message_batch_results(batch_id, job, saved, processor)
+    except BaseException:
+        # Hand the job back (minus the files already saved) so the next poll can retry;
+        # run inline because this task may be cancelled
+        _release_message_batch_job(batch_id, {k: v for k, v in job.files.items() if k not in saved})
+        raise
+    await asyncio.to_thread(_delete_message_batch_job, batch_id)
+    return results
+
 class SupplierReassignmentRequest(BaseModel):
     supplier_product_ids: List[int]
     new_supplier_id: int
@@ -240,7 +512,7 @@ class TextProcessingRequest(BaseModel):
     category_id: Optional[int] = None
 
 @router.post("/reassign-supplier")
-async def reassign_supplier_for_products(
+def reassign_supplier_for_products(
     request: SupplierReassignmentRequest,
     db: Session = Depends(get_db),
     user: dict = Depends(verify_google_token)
@@ -255,30 +527,47 @@ async def reassign_supplier_for_products(
         if not new_supplier:
             raise HTTPException(status_code=404, detail="New supplier not found")
         
-        # Get all supplier-product relationships to update
-        supplier_products = db.query(SupplierProduct).filter(
+        # Get all supplier-product relationships to update (ids and product ids only)
+        supplier_products = db.query(SupplierProduct.id, SupplierProduct.product_id).filter(
             SupplierProduct.id.in_(request.supplier_product_ids)
-        ).all()
+        ).order_by(SupplierProduct.id).all()
         
         if len(supplier_products) != len(request.supplier_product_ids):
             raise HTTPException(status_code=404, detail="Some supplier-product relationships not found")
         
-        updated_count = 0
+        # Products the new supplier already has a relationship for, in one query
+        product_ids = {sp.product_id for sp in supplier_products if sp.product_id is not None}
+        existing_product_ids = set()
+        if product_ids:
+            existing_product_ids = set(db.scalars(
+                select(SupplierProduct.product_id).where(
+                    SupplierProduct.supplier_id == request.new_supplier_id,
+                    SupplierProduct.product_id.in_(product_ids),
+                    SupplierProduct.id.notin_(request.supplier_product_ids)
+                )
+            ))
+        
+        # If a relationship exists, delete the old one and keep the existing; otherwise move it.
+        # Only the first selected row per product is moved, the rest are deleted like existing duplicates.
+        delete_ids = []
+        move_ids = []
         for sp in supplier_products:
-            # Check if a relationship between this product and new supplier already exists
-            existing = db.query(SupplierProduct).filter(
-                SupplierProduct.supplier_id == request.new_supplier_id,
-                SupplierProduct.product_id == sp.product_id
-            ).first()
-            
-            if existing:
-                # If relationship exists, delete the old one and keep the existing
-                db.delete(sp)
-                updated_count += 1
+            if sp.product_id in existing_product_ids:
+                delete_ids.append(sp.id)
             else:
-                # Update the supplier_id
-                sp.supplier_id = request.new_supplier_id
-                updated_count += 1
+                move_ids.append(sp.id)
+                if sp.product_id is not None:
+                    existing_product_ids.add(sp.product_id)
+        if delete_ids:
+            db.execute(delete(SupplierProduct).where(SupplierProduct.id.in_(delete_ids)).execution_options(synchronize_session=False))
+        if move_ids:
+            db.execute(
+                update(SupplierProduct)
+                .where(SupplierProduct.id.in_(move_ids))
+                .values(supplier_id=request.new_supplier_id)
+                .execution_options(synchronize_session=False)
+            )
+        updated_count = len(supplier_products)
         
         db.commit()
         
@@ -300,7 +589,8 @@ async def reassign_supplier_for_products(
 async def process_text_content(
     request: TextProcessingRequest,
     db: Session = Depends(get_db),
-    user: dict = Depends(verify_google_token)
+    user: dict = Depends(verify_google_token),
+    processor: QuotationProcessor = Depends(get_processor)
 ):
     """
     Process text content directly (WhatsApp conversations, Google Sheets data, etc.).
@@ -317,24 +607,11 @@ async def process_text_content(
     if not request.text_content.strip():
         raise HTTPException(status_code=400, detail="Text content cannot be empty")
     
-    # Create a temporary text file to use with the existing processor
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as temp_file:
-        temp_file.write(request.text_content)
-        temp_file_path = temp_file.name
-    
     try:
-        # Initialize the quotation processor
-        processor = QuotationProcessor(claude_api_key)
-        
-        # Process the text content
-        results = processor.process_quotation(temp_file_path, request.category_id)
+        # The text is already in memory: hand it to the processor directly, no temp file round trip
+        results = await asyncio.to_thread(processor.process_text, request.text_content, request.category_id)
         
         return results
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-        
-    finally:
-        # Clean up the temporary file
-        if os.path.exists(temp_file_path):
-            os.unlink(temp_file_path) 
\ No newline at end of file
@@ -1,13 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
+from sqlalchemy import func, case, update
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 from models import get_db, Supplier, SupplierProduct, Product
 from auth import verify_google_token
 
-router = APIRouter(prefix="/suppliers", tags=["suppliers"], dependencies=[Depends(verify_google_token)])
+router = APIRouter(
+    prefix="/suppliers",
+    tags=["suppliers"],
+    dependencies=[Depends(verify_google_token)],
+    default_response_class=ORJSONResponse,
+)
 
 # Pydantic models for request/response
 class SupplierBase(BaseModel):
@@ -247,30 +253,34 @@ def update_supplier(supplier_id: int, supplier: SupplierUpdate, db: Session = De
     }
     return {"success": True, "data": data, "error": None, "message": None} 
 # Archive/Unarchive endpoints
+def _set_archived_at(db: Session, supplier_id: int, archived_at):
+    """Set archived_at on one supplier in a single UPDATE ... RETURNING; None if it doesn't exist."""
+    row = db.execute(
+        update(Supplier)
+        .where(Supplier.id == supplier_id)
+        .values(archived_at=archived_at)
+        .returning(Supplier.archived_at)
+        .execution_options(synchronize_session=False)
+    ).first()
+    db.commit()
+    return row
+
 @router.patch("/{supplier_id}/archive")
 def archive_supplier(supplier_id: int, db: Session = Depends(get_db), user: dict = Depends(verify_google_token)):
     """Archive a supplier (soft delete)"""
-    db_supplier = db.query(Supplier).filter(Supplier.id == supplier_id).first()
-    if db_supplier is None:
+    row = _set_archived_at(db, supplier_id, func.now())
+    if row is None:
         return {"success": False, "data": None, "error": "Supplier not found", "message": None}
     
-    db_supplier.archived_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_supplier)
-    
-    return {"success": True, "data": {"id": supplier_id, "archived_at": db_supplier.archived_at}, "error": None, "message": "Supplier archived successfully"}
+    return {"success": True, "data": {"id": supplier_id, "archived_at": row.archived_at}, "error": None, "message": "Supplier archived successfully"}
 
 @router.patch("/{supplier_id}/unarchive")
 def unarchive_supplier(supplier_id: int, db: Session = Depends(get_db), user: dict = Depends(verify_google_token)):
     """Unarchive a supplier (restore from soft delete)"""
-    db_supplier = db.query(Supplier).filter(Supplier.id == supplier_id).first()
-    if db_supplier is None:
+    row = _set_archived_at(db, supplier_id, None)
+    if row is None:
         return {"success": False, "data": None, "error": "Supplier not found", "message": None}
     
-    db_supplier.archived_at = None
-    db.commit()
-    db.refresh(db_supplier)
-    
     return {"success": True, "data": {"id": supplier_id, "archived_at": None}, "error": None, "message": "Supplier restored successfully"}
 
 @router.get("/{supplier_id}/products")
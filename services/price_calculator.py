@@ -6,7 +6,19 @@ from decimal import Decimal
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 from models import Product, SupplierProduct
-from sqlalchemy import and_
+from sqlalchemy import and_, case, func
+
+
+# Total shipping cost per unit of a SupplierProduct, by shipping method, as a SQL expression
+TOTAL_SHIPPING_COST = case(
+    (SupplierProduct.shipping_method == 'DIRECT', func.coalesce(SupplierProduct.shipping_cost_direct, 0)),
+    else_=(
+        func.coalesce(SupplierProduct.shipping_stage1_cost, 0) +
+        func.coalesce(SupplierProduct.shipping_stage2_cost, 0) +
+        func.coalesce(SupplierProduct.shipping_stage3_cost, 0) +
+        func.coalesce(SupplierProduct.shipping_stage4_cost, 0)
+    )
+)
 
 
 def calculate_price_with_margin(cost: Decimal, margin: Decimal) -> Decimal:
@@ -42,21 +54,8 @@ def get_lowest_supplier_cost(product_id: int, db: Session) -> Optional[Decimal]:
         The lowest total supplier cost (including shipping) or None if no suppliers with cost
     """
     # Query for cost + total shipping cost based on shipping method
-    from sqlalchemy import func, case
-    
-    # Calculate total shipping cost based on method
-    total_shipping_cost = case(
-        (SupplierProduct.shipping_method == 'DIRECT', func.coalesce(SupplierProduct.shipping_cost_direct, 0)),
-        else_=(
-            func.coalesce(SupplierProduct.shipping_stage1_cost, 0) +
-            func.coalesce(SupplierProduct.shipping_stage2_cost, 0) +
-            func.coalesce(SupplierProduct.shipping_stage3_cost, 0) +
-            func.coalesce(SupplierProduct.shipping_stage4_cost, 0)
-        )
-    )
-    
     supplier_costs = db.query(
-        (SupplierProduct.cost + total_shipping_cost).label('total_cost')
+        (SupplierProduct.cost + TOTAL_SHIPPING_COST).label('total_cost')
     ).filter(
         and_(
             SupplierProduct.product_id == product_id,
@@ -64,7 +63,7 @@ def get_lowest_supplier_cost(product_id: int, db: Session) -> Optional[Decimal]:
             SupplierProduct.cost.isnot(None),
             SupplierProduct.cost > 0
         )
-    ).order_by((SupplierProduct.cost + total_shipping_cost).asc()).first()
+    ).order_by((SupplierProduct.cost + TOTAL_SHIPPING_COST).asc()).first()
     
     return supplier_costs[0] if supplier_costs else None
 
@@ -80,21 +79,8 @@ def get_lowest_supplier_cost_with_currency(product_id: int, db: Session) -> Opti
     Returns:
         Tuple of (lowest_cost, currency) or None if no suppliers with cost
     """
-    from sqlalchemy import func, case
-    
-    # Calculate total shipping cost based on method
-    total_shipping_cost = case(
-        (SupplierProduct.shipping_method == 'DIRECT', func.coalesce(SupplierProduct.shipping_cost_direct, 0)),
-        else_=(
-            func.coalesce(SupplierProduct.shipping_stage1_cost, 0) +
-            func.coalesce(SupplierProduct.shipping_stage2_cost, 0) +
-            func.coalesce(SupplierProduct.shipping_stage3_cost, 0) +
-            func.coalesce(SupplierProduct.shipping_stage4_cost, 0)
-        )
-    )
-    
     supplier_costs = db.query(
-        (SupplierProduct.cost + total_shipping_cost).label('total_cost'),
+        (SupplierProduct.cost + TOTAL_SHIPPING_COST).label('total_cost'),
         SupplierProduct.currency
     ).filter(
         and_(
@@ -103,13 +89,51 @@ def get_lowest_supplier_cost_with_currency(product_id: int, db: Session) -> Opti
             SupplierProduct.cost.isnot(None),
             SupplierProduct.cost > 0
         )
-    ).order_by((SupplierProduct.cost + total_shipping_cost).asc()).first()
+    ).order_by((SupplierProduct.cost + TOTAL_SHIPPING_COST).asc()).first()
     
     if supplier_costs:
         return supplier_costs[0], supplier_costs[1]
     return None
 
 
+def get_lowest_supplier_costs_with_currency(product_ids: List[int], db: Session) -> Dict[int, tuple[Decimal, str]]:
+    """
+    Batch version of get_lowest_supplier_cost_with_currency: one query for many products
+    
+    Args:
+        product_ids: The product IDs
+        db: Database session
+    
+    Returns:
+        Mapping of product_id -> (lowest_cost, currency); products without suppliers with cost are absent
+    """
+    if not product_ids:
+        return {}
+    
+    total_cost = SupplierProduct.cost + TOTAL_SHIPPING_COST
+    
+    # Rank each product's supplier rows by total cost and keep the cheapest one
+    ranked = db.query(
+        SupplierProduct.product_id.label('product_id'),
+        total_cost.label('total_cost'),
+        SupplierProduct.currency.label('currency'),
+        func.row_number().over(
+            partition_by=SupplierProduct.product_id,
+            order_by=total_cost.asc()
+        ).label('rank')
+    ).filter(
+        and_(
+            SupplierProduct.product_id.in_(product_ids),
+            SupplierProduct.is_active == True,
+            SupplierProduct.cost.isnot(None),
+            SupplierProduct.cost > 0
+        )
+    ).subquery()
+    
+    rows = db.query(ranked.c.product_id, ranked.c.total_cost, ranked.c.currency).filter(ranked.c.rank == 1).all()
+    return {product_id: (cost, currency) for product_id, cost, currency in rows}
+
+
 def calculate_product_price_with_default_margin(product: Product, db: Session) -> Optional[Decimal]:
     """
     Calculate product price using default margin if price is null
@@ -204,22 +228,9 @@ def enrich_products_with_calculated_prices(products: List[Dict[str, Any]], db: S
     product_ids = [p['id'] for p in products_needing_calculation]
     
     # Get lowest total costs (base cost + shipping) for all products in one query
-    from sqlalchemy import and_, func, case
-    
-    # Calculate total shipping cost based on method
-    total_shipping_cost = case(
-        (SupplierProduct.shipping_method == 'DIRECT', func.coalesce(SupplierProduct.shipping_cost_direct, 0)),
-        else_=(
-            func.coalesce(SupplierProduct.shipping_stage1_cost, 0) +
-            func.coalesce(SupplierProduct.shipping_stage2_cost, 0) +
-            func.coalesce(SupplierProduct.shipping_stage3_cost, 0) +
-            func.coalesce(SupplierProduct.shipping_stage4_cost, 0)
-        )
-    )
-    
     lowest_costs_query = db.query(
         SupplierProduct.product_id,
-        func.min(SupplierProduct.cost + total_shipping_cost).label('lowest_cost')
+        func.min(SupplierProduct.cost + TOTAL_SHIPPING_COST).label('lowest_cost')
     ).filter(
         and_(
             SupplierProduct.product_id.in_(product_ids),
@@ -0,0 +1,67 @@
+"""
+Unit tests for the verified-token cache in auth
+"""
+
+import os
+import time
+import pytest
+from fastapi.security import HTTPAuthorizationCredentials
+
+os.environ.setdefault("ALLOWED_EMAILS", "tester@impag.mx")
+
+import auth
+
+
+def _credentials(token):
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+@pytest.fixture
+def fake_google(monkeypatch):
+    """Replace Google verification with a counter returning a valid idinfo"""
+    calls = []
+
+    def verify(token, request, audience):
+        calls.append(token)
+        return {"email": "Tester@impag.mx", "sub": "123", "exp": time.time() + 3600}
+
+    monkeypatch.setattr(auth, "DISABLE_AUTH", False)
+    monkeypatch.setattr(auth, "ALLOWED_EMAILS", {"tester@impag.mx"})
+    monkeypatch.setattr(auth.id_token, "verify_oauth2_token", verify)
+    monkeypatch.setattr(auth, "_token_cache", auth.TTLCache(maxsize=auth.TOKEN_CACHE_SIZE, ttl=auth.TOKEN_CACHE_TTL))
+    return calls
+
+
+def test_verified_token_is_cached(fake_google):
+    """Test that a second request with the same token skips verification"""
+    first = auth.verify_google_token(_credentials("token-a"))
+    second = auth.verify_google_token(_credentials("token-a"))
+
+    assert first == second
+    assert first["email"] == "tester@impag.mx"
+    assert fake_google == ["token-a"]
+
+
+def test_expired_cache_entry_is_reverified(fake_google, monkeypatch):
+    """Test that entries past their expiry trigger a fresh verification"""
+    auth.verify_google_token(_credentials("token-b"))
+    later = time.monotonic() + auth.TOKEN_CACHE_TTL + 1
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+
+    auth.verify_google_token(_credentials("token-b"))
+    assert fake_google == ["token-b", "token-b"]
+
+
+def test_cache_is_bounded(fake_google, monkeypatch):
+    """Test that the cache never holds more than its maxsize tokens"""
+    monkeypatch.setattr(auth, "_token_cache", auth.TTLCache(maxsize=2, ttl=auth.TOKEN_CACHE_TTL))
+    for token in ("t1", "t2", "t3"):
+        auth.verify_google_token(_credentials(token))
+
+    assert len(auth._token_cache) == 2
+    auth.verify_google_token(_credentials("t1"))
+    assert fake_google == ["t1", "t2", "t3", "t1"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,61 @@
+"""
+Unit tests for the ETag / 304 middleware
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from utils.etag import ETagMiddleware
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(ETagMiddleware, path_prefixes=("/products",))
+
+    @app.get("/products")
+    def list_products():
+        return {"success": True, "data": [{"id": 1}]}
+
+    @app.get("/products/stream")
+    def stream_products():
+        return StreamingResponse(iter([b"a", b"b"]), media_type="text/plain")
+
+    @app.get("/other")
+    def other():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_matching_if_none_match_returns_304(client):
+    """Test that a repeat request with the ETag gets an empty 304"""
+    first = client.get("/products")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    second = client.get("/products", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+
+
+def test_stale_etag_returns_full_body(client):
+    """Test that a non-matching ETag still gets the full response"""
+    response = client.get("/products", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+
+
+def test_streaming_and_unmatched_paths_are_untouched(client):
+    """Test that streaming responses and other prefixes get no ETag"""
+    streamed = client.get("/products/stream")
+    assert streamed.text == "ab"
+    assert "etag" not in streamed.headers
+    assert "etag" not in client.get("/other").headers
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
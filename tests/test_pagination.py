@@ -0,0 +1,37 @@
+"""
+Unit tests for keyset pagination cursors
+"""
+
+import pytest
+from datetime import datetime, timezone
+from utils.pagination import encode_cursor, decode_cursor, decode_datetime
+
+
+def test_cursor_round_trip():
+    """Test that a (created_at, id) cursor decodes back to the same values"""
+    created_at = datetime(2026, 10, 17, 12, 30, tzinfo=timezone.utc)
+    cursor = encode_cursor(created_at, 42)
+
+    raw_created_at, row_id = decode_cursor(cursor, 2)
+    assert decode_datetime(raw_created_at) == created_at
+    assert row_id == 42
+
+
+def test_cursor_is_url_safe():
+    """Test that cursors can be passed as query params without escaping"""
+    cursor = encode_cursor("malla sombra 50% / negra?", 7)
+    assert "=" not in cursor
+    assert "+" not in cursor
+    assert "/" not in cursor
+
+
+def test_decode_cursor_rejects_garbage():
+    """Test that malformed or wrong-sized cursors raise ValueError"""
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", 2)
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(1, 2, 3), 2)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,48 @@
+"""
+Unit tests for the in-process TTL cache
+"""
+
+import time
+import pytest
+from utils.ttl_cache import TTLCache
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    """Test that an entry is gone once its TTL has passed"""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=10, ttl=30)
+
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    now[0] += 31
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    """Test that the cache never grows past maxsize"""
+    cache = TTLCache(maxsize=2, ttl=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_pop_and_clear():
+    """Test explicit invalidation"""
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.pop("a")
+    assert cache.get("a") is None
+    cache.clear()
+    assert cache.get("b") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,93 @@
+"""
+ETag / 304 Not Modified support for read-heavy GET endpoints.
+
+The response body is hashed after the handler runs; when the client's
+If-None-Match already names that hash, the body is dropped and a 304 is sent.
+Streaming responses (more than one body chunk) are passed through untouched.
+"""
+
+from hashlib import blake2b
+from typing import Iterable
+
+# Responses are per-user (authenticated), and clients must revalidate on every use
+CACHE_CONTROL = b"private, no-cache"
+
+
+def compute_etag(body: bytes) -> str:
+    return '"' + blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    # Weak comparison: W/"x" matches "x"
+    return "*" in candidates or any(c.removeprefix("W/") == etag for c in candidates)
+
+
+class ETagMiddleware:
+    """Pure ASGI middleware adding ETag headers and 304s to GETs under `path_prefixes`."""
+
+    def __init__(self, app, path_prefixes: Iterable[str] = ("/",)):
+        self.app = app
+        self.path_prefixes = tuple(path_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not scope["path"].startswith(self.path_prefixes)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = None
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                if_none_match = value.decode("latin-1")
+                break
+
+        start_message = None
+        passthrough = False
+
+        async def send_with_etag(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                if message["status"] != 200:
+                    passthrough = True
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                # Streaming response: don't buffer it, send as-is
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            etag = compute_etag(body)
+            headers = [
+                (k, v) for k, v in start_message["headers"]
+                if k not in (b"etag", b"cache-control")
+            ]
+            headers.append((b"etag", etag.encode("latin-1")))
+            headers.append((b"cache-control", CACHE_CONTROL))
+
+            if if_none_match and _etag_matches(if_none_match, etag):
+                headers = [(k, v) for k, v in headers if k not in (b"content-length", b"content-type")]
+                await send({"type": "http.response.start", "status": 304, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            await send({**start_message, "headers": headers})
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -0,0 +1,43 @@
+"""
+Keyset (seek) pagination helpers.
+
+A cursor is the opaque, URL-safe encoding of the sort key of the last row on a
+page, e.g. (created_at, id). The next page filters on `(cols) < (cursor values)`
+instead of OFFSET, so page N costs the same as page 1.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort-key values of the last row of a page into an opaque cursor."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises ValueError if the cursor is malformed or does not hold `size` values.
+    Datetimes come back as ISO strings; use decode_datetime on them.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def decode_datetime(value: Any) -> datetime:
+    """Parse an ISO timestamp taken from a decoded cursor."""
+    if not isinstance(value, str):
+        raise ValueError("Invalid cursor")
+    return datetime.fromisoformat(value)
@@ -0,0 +1,23 @@
+"""
+PDF text extraction for the quotation parse pool.
+
+Kept apart from quotation_processor so process-pool workers (started with
+forkserver) import only PyMuPDF, not models.py and its engine/create_all.
+"""
+
+import fitz  # PyMuPDF
+
+
+def extract_pdf_text(pdf_path: str) -> str:
+    """
+    Extract the text of a PDF file.
+
+    A plain function rather than a QuotationProcessor method so it can run in a
+    process pool: PyMuPDF parsing is CPU-bound and holds the GIL.
+    """
+    try:
+        # The context manager closes the document even when a page fails to parse
+        with fitz.open(pdf_path) as doc:
+            return "\n".join(page.get_text("text") for page in doc)
+    except Exception as e:
+        raise Exception(f"Error extracting text from PDF: {str(e)}")
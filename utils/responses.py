@@ -0,0 +1,28 @@
+"""
+JSON response class for endpoints that return large payloads.
+
+Returning an instance of FastORJSONResponse directly from a handler skips
+FastAPI's jsonable_encoder pass; orjson encodes the content in one go. The
+`default` hook covers the non-JSON types our serializers can still hand over
+(Decimal from Numeric columns, Enum columns).
+"""
+
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+def orjson_default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastORJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=orjson_default)